@@ -1,148 +1,437 @@
 # Phase 2 Scout logic frozen — do not modify without review
+import asyncio
+import logging
 import os
-import requests
+import threading
+from typing import Awaitable, Callable, Optional
+
+import httpx
+import orjson
+from cachetools import TTLCache
+from dotenv import load_dotenv
 
 # Scout Phase 2 logic frozen after relevance-gated ranking validation.
 # Validation confirmed: relevance-based demotion (0.3x for irrelevant),
 # whitelist boost (1.25x) applied last, ~20 candidate pool, proper deduplication.
 
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
 YOUTUBE_API_KEY = os.getenv("YOUTUBE_API_KEY")
 
+if not YOUTUBE_API_KEY:
+    raise RuntimeError("Missing environment variable: YOUTUBE_API_KEY")
+
 SEARCH_URL = "https://www.googleapis.com/youtube/v3/search"
 STATS_URL = "https://www.googleapis.com/youtube/v3/videos"
 
+# Fixed query parameters, built once; requests merge in only what varies
+_BASE_SEARCH_PARAMS = {"part": "snippet", "type": "video", "key": YOUTUBE_API_KEY}
+_BASE_STATS_PARAMS = {"part": "statistics", "key": YOUTUBE_API_KEY}
 
-def fetch_videos_from_channel(query: str, channel_id: str, max_results: int = 5):
-    # 1. search videos
-    search_params = {
-        "part": "snippet",
-        "q": query,
-        "type": "video",
-        "maxResults": max_results,
-        "channelId": channel_id,
-        "key": YOUTUBE_API_KEY,
-    }
+# Connection pool for googleapis.com, shared across requests for keep-alive reuse
+MAX_CONNECTIONS = 32
+MAX_KEEPALIVE_CONNECTIONS = 16
+REQUEST_TIMEOUT_SECONDS = 10.0
+
+# Transient upstream failures are retried with exponential backoff
+RETRY_STATUSES = {500, 502, 503, 504}
+MAX_RETRIES = 2
+RETRY_BACKOFF_SECONDS = 0.2
+
+# YouTube caps search.list maxResults and videos.list ids at 50 per request
+MAX_API_BATCH = 50
+
+# Popular topics repeat across users within minutes; keep finished scout
+# results briefly so repeats skip the YouTube API (and its quota) entirely.
+SCOUT_CACHE_MAXSIZE = 2048
+SCOUT_CACHE_TTL_SECONDS = 600
+
+_client: Optional[httpx.AsyncClient] = None
+
+_scout_cache: TTLCache = TTLCache(maxsize=SCOUT_CACHE_MAXSIZE, ttl=SCOUT_CACHE_TTL_SECONDS)
+# Threading lock because scout_videos may run on a worker thread's own event loop
+_scout_cache_lock = threading.Lock()
+
+# (event loop, cache key) -> task of the in-progress fetch, so concurrent
+# misses (e.g. both scout phases reading the global pool) share one API call
+_inflight_fetches: dict = {}
+
+
+def _new_client() -> httpx.AsyncClient:
+    limits = httpx.Limits(
+        max_connections=MAX_CONNECTIONS,
+        max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+    )
+    # HTTP/2 multiplexes the search and stats calls over one connection;
+    # with brotli installed httpx also advertises br alongside gzip
+    return httpx.AsyncClient(
+        transport=httpx.AsyncHTTPTransport(limits=limits, retries=MAX_RETRIES, http2=True),
+        timeout=REQUEST_TIMEOUT_SECONDS,
+    )
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Get or create the shared YouTube API client."""
+    global _client
+    if _client is None:
+        _client = _new_client()
+    return _client
+
+
+async def close_http_client() -> None:
+    """Close the shared YouTube API client (call on app shutdown)."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def _cached_fetch(cache_key, fetcher: Callable[[], Awaitable[list]]) -> list:
+    """
+    Return the cached search items for cache_key, or run fetcher and cache them.
+
+    Concurrent misses for the same key on one event loop await a single fetch.
+    """
+    with _scout_cache_lock:
+        items = _scout_cache.get(cache_key)
+    if items is not None:
+        return items
+
+    inflight_key = (asyncio.get_running_loop(), cache_key)
+    with _scout_cache_lock:
+        task = _inflight_fetches.get(inflight_key)
+        if task is None:
+            task = asyncio.ensure_future(fetcher())
+            _inflight_fetches[inflight_key] = task
+            task.add_done_callback(lambda _: _inflight_fetches.pop(inflight_key, None))
 
-    search_response = requests.get(SEARCH_URL, params=search_params)
-    search_response.raise_for_status()
-    search_data = search_response.json()
+    # Shielded so one cancelled caller doesn't cancel the fetch for the others
+    items = await asyncio.shield(task)
+    with _scout_cache_lock:
+        _scout_cache[cache_key] = items
+    return items
+
+
+def flush_scout_cache() -> int:
+    """Drop every cached scout result. Returns the number of entries removed."""
+    with _scout_cache_lock:
+        count = len(_scout_cache)
+        _scout_cache.clear()
+    return count
+
+
+async def _get_json(client: httpx.AsyncClient, url: str, params: dict) -> dict:
+    """GET a YouTube API endpoint, retrying transient 5xx responses."""
+    for attempt in range(MAX_RETRIES + 1):
+        response = await client.get(url, params=params)
+        if response.status_code not in RETRY_STATUSES or attempt == MAX_RETRIES:
+            break
+        await asyncio.sleep(RETRY_BACKOFF_SECONDS * (2 ** attempt))
+
+    response.raise_for_status()
+    # orjson parses the raw bytes directly, skipping httpx's text decode + stdlib json
+    return orjson.loads(response.content)
+
+
+def _search_params(query: str, max_results: int, channel_id: Optional[str] = None) -> dict:
+    params = _BASE_SEARCH_PARAMS | {"q": query, "maxResults": max_results}
+    if channel_id:
+        params["channelId"] = channel_id
+    return params
+
+
+async def search_channel_items(
+    query: str,
+    channel_id: str,
+    max_results: int = 5,
+    *,
+    client: httpx.AsyncClient,
+) -> list:
+    """Search a single channel. Returns raw search.list items (no statistics)."""
+    async def _fetch():
+        search_data = await _get_json(
+            client, SEARCH_URL, _search_params(query, max_results, channel_id)
+        )
+        return search_data.get("items", [])
+
+    return await _cached_fetch((channel_id, query, max_results), _fetch)
+
+
+async def _global_pool(query: str, *, client: httpx.AsyncClient) -> list:
+    """
+    The top MAX_API_BATCH unfiltered search results for query.
+
+    Both phases read from this one search.list call: the whitelist phase
+    picks its channels out of it and the global phase takes its head.
+    """
+    async def _fetch():
+        search_data = await _get_json(client, SEARCH_URL, _search_params(query, MAX_API_BATCH))
+        return search_data.get("items", [])
+
+    return await _cached_fetch(("*", query, MAX_API_BATCH), _fetch)
+
+
+async def search_global_items(
+    query: str,
+    max_results: int = 12,
+    exclude_channel_ids: frozenset = frozenset(),
+    *,
+    client: httpx.AsyncClient,
+) -> list:
+    """
+    Search YouTube globally (any channel). Returns raw search.list items.
+    Excludes channels in exclude_channel_ids to prevent double-weighting.
+
+    The top max_results (at most MAX_API_BATCH) come from the shared global
+    pool, so this costs no extra search when the whitelist phase ran too.
+    """
+    items = (await _global_pool(query, client=client))[:max_results]
 
-    video_ids = [
-        item["id"]["videoId"]
-        for item in search_data.get("items", [])
+    # Skip whitelisted channels to prevent double-weighting
+    # These channels are already handled in Phase A (whitelisted fetch)
+    return [
+        item for item in items
+        if item["snippet"]["channelId"] not in exclude_channel_ids
     ]
 
-    if not video_ids:
+
+async def search_whitelist_items(
+    query: str,
+    channel_ids,
+    max_per_channel: int = 3,
+    *,
+    client: httpx.AsyncClient,
+) -> list:
+    """
+    Search whitelisted channels, skipping per-channel searches where possible.
+
+    search.list accepts a single channelId, so the shared global pool is
+    scanned first. A channel with max_per_channel hits there is served from
+    the pool. Every other channel gets its own per-channel search, exactly as
+    if there were no pool, so whitelist recall never drops below one search
+    per channel; if that search fails, its pool hits are kept.
+    Returns raw search.list items.
+    """
+    channel_ids = frozenset(channel_ids)  # no copy when already a frozenset
+    if not channel_ids:
         return []
 
-    # 2. fetch statistics
-    stats_params = {
-        "part": "statistics",
-        "id": ",".join(video_ids),
-        "key": YOUTUBE_API_KEY,
-    }
+    pool_hits = {}
+    for item in await _global_pool(query, client=client):
+        channel_id = item["snippet"]["channelId"]
+        if channel_id in channel_ids:
+            hits = pool_hits.setdefault(channel_id, [])
+            if len(hits) < max_per_channel:
+                hits.append(item)
+
+    short_channel_ids = [
+        channel_id for channel_id in channel_ids
+        if len(pool_hits.get(channel_id, ())) < max_per_channel
+    ]
+    fallbacks = await asyncio.gather(*[
+        search_channel_items(query, channel_id, max_per_channel, client=client)
+        for channel_id in short_channel_ids
+    ], return_exceptions=True)
+
+    # One failing channel shouldn't poison the batch
+    for channel_id, batch in zip(short_channel_ids, fallbacks):
+        if isinstance(batch, Exception):
+            logger.warning(f"Channel search failed for {channel_id}: {str(batch)}")
+            continue
+        pool_hits[channel_id] = batch
+
+    return [item for hits in pool_hits.values() for item in hits]
 
-    stats_response = requests.get(STATS_URL, params=stats_params)
-    stats_response.raise_for_status()
-    stats_data = stats_response.json()
 
-    stats_map = {
-        item["id"]: item["statistics"]
-        for item in stats_data.get("items", [])
+async def _fetch_stats(client: httpx.AsyncClient, video_ids) -> dict:
+    """
+    Fetch statistics for video_ids in as few videos.list calls as possible.
+
+    Ids still in the scout cache are skipped; the rest are chunked to the
+    API's 50-id limit.
+    """
+    stats_map = {}
+    missing = []
+    with _scout_cache_lock:
+        for vid in video_ids:
+            stats = _scout_cache.get(("stats", vid))
+            if stats is None:
+                missing.append(vid)
+            else:
+                stats_map[vid] = stats
+
+    chunks = [
+        missing[i:i + MAX_API_BATCH]
+        for i in range(0, len(missing), MAX_API_BATCH)
+    ]
+    responses = await asyncio.gather(*[
+        _get_json(client, STATS_URL, _BASE_STATS_PARAMS | {"id": ",".join(chunk)})
+        for chunk in chunks
+    ])
+
+    with _scout_cache_lock:
+        for stats_data in responses:
+            for item in stats_data.get("items", []):
+                stats_map[item["id"]] = item["statistics"]
+                _scout_cache[("stats", item["id"])] = item["statistics"]
+
+    return stats_map
+
+
+def _to_video(vid: str, snippet: dict, stats: dict) -> dict:
+    views = int(stats.get("viewCount", 0))
+    comments = int(stats.get("commentCount", 0))
+
+    return {
+        "title": snippet["title"],
+        "description": snippet.get("description", ""),
+        "channel": snippet["channelTitle"],
+        "channel_id": snippet["channelId"],
+        "youtube_url": f"https://www.youtube.com/watch?v={vid}",
+        "views": views,
+        "comments": comments,
+        "engagement_score": views + comments,
     }
 
-    videos = []
-    for item in search_data.get("items", []):
-        vid = item["id"]["videoId"]
-        stats = stats_map.get(vid, {})
 
-        views = int(stats.get("viewCount", 0))
-        comments = int(stats.get("commentCount", 0))
+async def scout_run(
+    query: str,
+    channel_ids,
+    max_per_channel: int = 3,
+    global_max_results: int = 17,
+    client: Optional[httpx.AsyncClient] = None,
+):
+    """
+    Run the whitelist search (Phase A) and the global search (Phase B), then
+    fetch statistics for both in one batched pass.
+
+    Both phases return raw items only, so a videoId found by both is looked
+    up once. Searches run concurrently on one pooled client, so wall time is
+    roughly the slowest search plus one stats round trip. Defaults to the
+    shared module-level client.
+
+    Returns a flat list of candidate videos (whitelisted first, then global).
+    """
+    if client is None:
+        client = get_http_client()
+
+    # Hashed once here and shared by both phases' membership checks
+    channel_ids = frozenset(channel_ids)
+    phases = await asyncio.gather(
+        search_whitelist_items(query, channel_ids, max_per_channel, client=client),
+        search_global_items(
+            query,
+            global_max_results,
+            exclude_channel_ids=channel_ids,
+            client=client,
+        ),
+        return_exceptions=True,
+    )
 
-        videos.append({
-            "title": item["snippet"]["title"],
-            "description": item["snippet"].get("description", ""),
-            "channel": item["snippet"]["channelTitle"],
-            "channel_id": item["snippet"]["channelId"],
-            "youtube_url": f"https://www.youtube.com/watch?v={vid}",
-            "views": views,
-            "comments": comments,
-            "engagement_score": views + comments,
-        })
+    # A failed phase contributes nothing; only fail the run if both did
+    failures = [phase for phase in phases if isinstance(phase, Exception)]
+    if len(failures) == len(phases):
+        raise failures[0]
+    for failure in failures:
+        logger.warning(f"Scout phase failed for query {query!r}: {str(failure)}")
 
-    return videos
+    items = [
+        item
+        for phase in phases if not isinstance(phase, Exception)
+        for item in phase
+    ]
+    return await _with_stats(client, items)
 
 
-def fetch_videos_from_global_search(query: str, max_results: int = 12, exclude_channel_ids: set = None):
+async def _with_stats(client: httpx.AsyncClient, items: list) -> list:
+    """Turn raw search items into video dicts with one batched stats lookup."""
+    # One sweep over the items; the stats pass reuses these bindings
+    entries = [
+        (item["id"]["videoId"], item["snippet"])
+        for item in items
+    ]
+    video_ids = list(dict.fromkeys(vid for vid, _ in entries))
+    stats_map = await _fetch_stats(client, video_ids) if video_ids else {}
+
+    return [
+        _to_video(vid, snippet, stats_map.get(vid, {}))
+        for vid, snippet in entries
+    ]
+
+
+async def fetch_videos_stream(
+    query: str,
+    channel_ids,
+    max_per_channel: int = 3,
+    global_max_results: int = 17,
+    client: Optional[httpx.AsyncClient] = None,
+):
     """
-    Fetch videos from global YouTube search (any channel).
-    Similar to fetch_videos_from_channel but without channelId filter.
-    Excludes channels in exclude_channel_ids to prevent double-weighting.
+    Async generator variant of scout_run that yields each phase as it lands.
+
+    The whitelist phase is scheduled first, but whichever phase finishes first
+    is yielded first, so a slow global search never holds back whitelisted
+    results.
+
+    Yields:
+        (phase, videos) tuples, phase being "whitelist" or "global".
     """
-    if exclude_channel_ids is None:
-        exclude_channel_ids = set()
-    
-    # 1. search videos
-    search_params = {
-        "part": "snippet",
-        "q": query,
-        "type": "video",
-        "maxResults": max_results,
-        "key": YOUTUBE_API_KEY,
-    }
+    if client is None:
+        client = get_http_client()
 
-    search_response = requests.get(SEARCH_URL, params=search_params)
-    search_response.raise_for_status()
-    search_data = search_response.json()
+    # Hashed once here and shared by both phases' membership checks
+    channel_ids = frozenset(channel_ids)
 
-    video_ids = [
-        item["id"]["videoId"]
-        for item in search_data.get("items", [])
+    async def _phase(name, items_coro):
+        try:
+            return name, await _with_stats(client, await items_coro)
+        except Exception as e:
+            # Emit an empty phase rather than breaking the stream
+            logger.warning(f"Scout {name} phase failed for query {query!r}: {str(e)}")
+            return name, []
+
+    tasks = [
+        asyncio.ensure_future(_phase(
+            "whitelist",
+            search_whitelist_items(query, channel_ids, max_per_channel, client=client),
+        )),
+        asyncio.ensure_future(_phase(
+            "global",
+            search_global_items(
+                query,
+                global_max_results,
+                exclude_channel_ids=channel_ids,
+                client=client,
+            ),
+        )),
     ]
 
-    if not video_ids:
-        return []
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # Client disconnected mid-stream: don't leave searches running
+        for task in tasks:
+            task.cancel()
 
-    # 2. fetch statistics
-    stats_params = {
-        "part": "statistics",
-        "id": ",".join(video_ids),
-        "key": YOUTUBE_API_KEY,
-    }
 
-    stats_response = requests.get(STATS_URL, params=stats_params)
-    stats_response.raise_for_status()
-    stats_data = stats_response.json()
+def scout_videos(
+    query: str,
+    channel_ids,
+    max_per_channel: int = 3,
+    global_max_results: int = 17,
+):
+    """
+    Synchronous wrapper around scout_run for scripts and other sync callers.
 
-    stats_map = {
-        item["id"]: item["statistics"]
-        for item in stats_data.get("items", [])
-    }
+    Uses a private client because the shared one is bound to the app's event loop.
+    """
+    async def _run():
+        async with _new_client() as client:
+            return await scout_run(
+                query, channel_ids, max_per_channel, global_max_results, client=client
+            )
 
-    videos = []
-    for item in search_data.get("items", []):
-        channel_id = item["snippet"]["channelId"]
-        
-        # Skip whitelisted channels to prevent double-weighting
-        # These channels are already handled in Phase A (whitelisted fetch)
-        if channel_id in exclude_channel_ids:
-            continue
-        
-        vid = item["id"]["videoId"]
-        stats = stats_map.get(vid, {})
-
-        views = int(stats.get("viewCount", 0))
-        comments = int(stats.get("commentCount", 0))
-
-        videos.append({
-            "title": item["snippet"]["title"],
-            "description": item["snippet"].get("description", ""),
-            "channel": item["snippet"]["channelTitle"],
-            "channel_id": channel_id,
-            "youtube_url": f"https://www.youtube.com/watch?v={vid}",
-            "views": views,
-            "comments": comments,
-            "engagement_score": views + comments,
-        })
-
-    return videos
\ No newline at end of file
+    return asyncio.run(_run())
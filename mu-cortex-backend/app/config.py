@@ -0,0 +1,27 @@
+"""
+Typed application settings, read once from the environment.
+
+Values come from real environment variables first, then mu-cortex-backend/.env,
+then the repository root .env.
+"""
+from pathlib import Path
+from typing import Optional
+
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+class Settings(BaseSettings):
+    # Later env files win, so the backend .env overrides the root one
+    model_config = SettingsConfigDict(
+        env_file=(BACKEND_DIR.parent / ".env", BACKEND_DIR / ".env"),
+        extra="ignore",
+    )
+
+    # Validated on first use (see gemini_client._get_model), not at import
+    GEMINI_API_KEY: Optional[str] = None
+    GEMINI_CONCURRENCY: int = 8
+
+
+settings = Settings()
@@ -0,0 +1,54 @@
+"""
+Shared asyncpg connection pool for direct Postgres reads.
+
+supabase-py runs every query as a blocking PostgREST HTTP call; read paths on
+the request hot path use this pool instead. supabase-py stays for writes and
+anything that needs PostgREST/auth semantics.
+"""
+import os
+from typing import Optional
+
+import asyncpg
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DATABASE_URL = os.getenv("DATABASE_URL")
+
+POOL_MIN_SIZE = 10
+POOL_MAX_SIZE = 50
+POOL_MAX_INACTIVE_SECONDS = 300
+
+_pool: Optional[asyncpg.Pool] = None
+
+
+async def init_pool() -> asyncpg.Pool:
+    """Create the pool (call on app startup). Requires DATABASE_URL."""
+    global _pool
+    if not DATABASE_URL:
+        raise RuntimeError("Missing environment variable: DATABASE_URL")
+    if _pool is None:
+        _pool = await asyncpg.create_pool(
+            DATABASE_URL,
+            min_size=POOL_MIN_SIZE,
+            max_size=POOL_MAX_SIZE,
+            max_inactive_connection_lifetime=POOL_MAX_INACTIVE_SECONDS,
+            # Supavisor/pgbouncer in transaction mode can't keep prepared statements
+            statement_cache_size=0,
+        )
+    return _pool
+
+
+async def close_pool() -> None:
+    """Close the pool (call on app shutdown)."""
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+
+def get_pool() -> asyncpg.Pool:
+    """Get the pool created at startup."""
+    if _pool is None:
+        raise RuntimeError("Database pool not initialised; init_pool() runs on startup")
+    return _pool
@@ -1,9 +1,19 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 
-from app.routers import analytics, answers, auth, subjects, topics, videos
+from app.agents.scout_agent import close_http_client
+from app.db.pool import close_pool, init_pool
+from app.models.fast_db import close_rest_client
+from app.routers import admin, analytics, answers, auth, subjects, topics, videos
+from app.services.transcript_service import close_transcript_session
+from app.utils.cache import close_cache, init_cache
 
-app = FastAPI(title="MU Cortex Backend", version="0.1.0")
+app = FastAPI(
+    title="MU Cortex Backend",
+    version="0.1.0",
+    default_response_class=ORJSONResponse,
+)
 
 app.add_middleware(
     CORSMiddleware,
@@ -22,6 +32,27 @@ app.include_router(topics.router)
 app.include_router(videos.router)
 app.include_router(answers.router)
 app.include_router(analytics.router)
+app.include_router(admin.router)
+
+
+@app.on_event("startup")
+async def _init_pool():
+    # Fails startup when DATABASE_URL is missing, rather than the first request
+    await init_pool()
+
+
+@app.on_event("startup")
+async def _init_cache():
+    await init_cache()
+
+
+@app.on_event("shutdown")
+async def _close_clients():
+    await close_http_client()
+    await close_rest_client()
+    await close_cache()
+    await close_pool()
+    close_transcript_session()
 
 
 @app.get("/health")
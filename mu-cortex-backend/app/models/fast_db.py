@@ -0,0 +1,78 @@
+"""
+Thin async PostgREST client for read-heavy endpoints.
+
+supabase-py decodes responses with stdlib json on a blocking client; this
+talks to the same REST API over a pooled httpx.AsyncClient and parses with
+orjson, so large row sets don't tie up a worker thread.
+"""
+from typing import Optional
+
+import httpx
+import orjson
+
+from app.models.database import SUPABASE_SERVICE_KEY, SUPABASE_URL
+
+REST_URL = f"{SUPABASE_URL.rstrip('/')}/rest/v1"
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def get_rest_client() -> httpx.AsyncClient:
+    """Get or create the shared PostgREST client."""
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            base_url=REST_URL,
+            headers={
+                "apikey": SUPABASE_SERVICE_KEY,
+                "Authorization": f"Bearer {SUPABASE_SERVICE_KEY}",
+                "Accept": "application/json",
+            },
+            timeout=10.0,
+        )
+    return _client
+
+
+async def close_rest_client() -> None:
+    """Close the shared PostgREST client (call on app shutdown)."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def fast_select(table: str, params: dict) -> list[dict]:
+    """
+    Select rows from a table or view.
+
+    Args:
+        table: Table or view name.
+        params: PostgREST query parameters, e.g.
+            {"select": "id,name", "subject_id": "eq.<id>", "order": "score.desc"}.
+
+    Returns:
+        List of row dicts.
+    """
+    response = await get_rest_client().get(f"/{table}", params=params)
+    response.raise_for_status()
+    return orjson.loads(response.content)
+
+
+async def fast_rpc(function: str, args: dict) -> list[dict]:
+    """
+    Call a Postgres function exposed through PostgREST.
+
+    Args:
+        function: Function name (see schema.sql).
+        args: Named arguments.
+
+    Returns:
+        List of row dicts returned by the function.
+    """
+    response = await get_rest_client().post(
+        f"/rpc/{function}",
+        content=orjson.dumps(args),
+        headers={"Content-Type": "application/json"},
+    )
+    response.raise_for_status()
+    return orjson.loads(response.content)
@@ -1,7 +1,9 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 
 
 class Subject(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="ignore")
+
     id: str
     name: str
     code: str
@@ -11,9 +13,25 @@ class Subject(BaseModel):
 
 
 class VideoResource(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="ignore")
+
     id: str
     topic_id: str
     youtube_url: str
     title: str
     engagement_score: int
 
+
+class ScoutVideo(BaseModel):
+    """A ranked video as returned by GET /videos (internal fields dropped)."""
+
+    model_config = ConfigDict(frozen=True, extra="ignore")
+
+    title: str
+    description: str = ""
+    channel: str
+    channel_id: str
+    youtube_url: str
+    views: int
+    comments: int
+    engagement_score: int
@@ -0,0 +1,50 @@
+"""
+Repository for the channel whitelist.
+
+The active whitelist changes only on admin action, so it is cached in the
+shared response cache and memoized per worker as a frozenset.
+"""
+import time
+from typing import Optional
+
+from app.db.pool import get_pool
+from app.utils.cache import CachePolicy, delete_cache, get_cache, set_cache
+
+ACTIVE_WHITELIST_KEY = "channels:active"
+
+# Per-worker memo; kept short so an invalidation reaches every worker quickly
+LOCAL_TTL_SECONDS = 60
+
+_active_ids: Optional[frozenset] = None
+_active_ids_expires_at = 0.0
+
+
+async def get_active_channel_ids() -> frozenset:
+    """
+    Get the YouTube channel ids of all active whitelisted channels.
+
+    Returns:
+        Frozenset of channel ids (shared; do not rebuild per request).
+    """
+    global _active_ids, _active_ids_expires_at
+    if _active_ids is not None and time.monotonic() < _active_ids_expires_at:
+        return _active_ids
+
+    channel_ids = await get_cache(ACTIVE_WHITELIST_KEY)
+    if channel_ids is None:
+        rows = await get_pool().fetch(
+            "SELECT channel_id FROM public.channel_whitelist WHERE status = 'active'"
+        )
+        channel_ids = [row["channel_id"] for row in rows]
+        await set_cache(ACTIVE_WHITELIST_KEY, channel_ids, CachePolicy.HOUR)
+
+    _active_ids = frozenset(channel_ids)
+    _active_ids_expires_at = time.monotonic() + LOCAL_TTL_SECONDS
+    return _active_ids
+
+
+async def invalidate_active_channel_ids() -> None:
+    """Forget the cached whitelist (call after whitelist changes)."""
+    global _active_ids
+    _active_ids = None
+    await delete_cache(ACTIVE_WHITELIST_KEY)
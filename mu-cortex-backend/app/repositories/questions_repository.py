@@ -4,10 +4,17 @@ Repository for question data access.
 Provides functions to query the questions table in Supabase.
 """
 import asyncio
-from typing import Optional
+from typing import Dict, List, Optional
+
+from cachetools import TTLCache
 
 from app.models.database import supabase
 
+# Questions are immutable once ingested; cache hits skip the PostgREST round trip.
+# Only touched from the event loop thread, so no lock is needed.
+QUESTION_CACHE_TTL_SECONDS = 60 * 60
+_question_cache: TTLCache = TTLCache(maxsize=4096, ttl=QUESTION_CACHE_TTL_SECONDS)
+
 
 async def get_question_by_id(question_id: str) -> Optional[dict]:
     """
@@ -20,20 +27,68 @@ async def get_question_by_id(question_id: str) -> Optional[dict]:
         Dictionary with keys: id, question_text, marks, topic_id
         Returns None if question not found.
     """
+    cached = _question_cache.get(question_id)
+    if cached is not None:
+        return cached
+
     def _fetch_sync():
         try:
             resp = (
                 supabase.table("questions")
                 .select("id, question_text, marks, topic_id")
                 .eq("id", question_id)
+                .maybe_single()
                 .execute()
             )
             
-            if resp.data and len(resp.data) > 0:
-                return resp.data[0]
-            return None
+            # maybe_single returns one object (or no response at all when missing)
+            return resp.data if resp else None
         except Exception:
             return None
     
-    loop = asyncio.get_event_loop()
-    return await loop.run_in_executor(None, _fetch_sync)
+    question = await asyncio.to_thread(_fetch_sync)
+    # Misses aren't cached so a question ingested later is picked up
+    if question is not None:
+        _question_cache[question_id] = question
+    return question
+
+
+async def get_questions_by_ids(question_ids: List[str]) -> Dict[str, dict]:
+    """
+    Fetch many questions in one query instead of one round trip per id.
+
+    Args:
+        question_ids: UUID strings of the questions.
+
+    Returns:
+        Dictionary mapping id -> {id, question_text, marks, topic_id}.
+        Ids that are not found are simply absent.
+    """
+    questions = {}
+    missing = []
+    for question_id in dict.fromkeys(question_ids):
+        cached = _question_cache.get(question_id)
+        if cached is not None:
+            questions[question_id] = cached
+        else:
+            missing.append(question_id)
+
+    if not missing:
+        return questions
+
+    def _fetch_sync():
+        try:
+            resp = (
+                supabase.table("questions")
+                .select("id, question_text, marks, topic_id")
+                .in_("id", missing)
+                .execute()
+            )
+            return resp.data or []
+        except Exception:
+            return []
+
+    for row in await asyncio.to_thread(_fetch_sync):
+        _question_cache[row["id"]] = row
+        questions[row["id"]] = row
+    return questions
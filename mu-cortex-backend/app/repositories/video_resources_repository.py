@@ -0,0 +1,40 @@
+"""
+Repository for video resource data access.
+
+Reads go through the shared asyncpg pool (see app/db/pool.py).
+"""
+from typing import List
+
+from app.db.pool import get_pool
+
+# video_resources only stores the channel name, so that is the join key.
+# channel_name isn't unique in the whitelist, hence a semi-join (EXISTS)
+# rather than a LEFT JOIN that could duplicate videos.
+# Backed by idx_video_resources_topic_engagement and
+# idx_channel_whitelist_active_channel_name (schema.sql).
+_TOPIC_BUNDLE_SQL = (
+    "SELECT vr.youtube_url, vr.youtube_video_id, vr.title, vr.channel_name,"
+    " vr.engagement_score,"
+    " EXISTS (SELECT 1 FROM public.channel_whitelist cw"
+    " WHERE cw.channel_name = vr.channel_name AND cw.status = 'active') AS whitelisted"
+    " FROM public.video_resources vr"
+    " WHERE vr.topic_id = $1::uuid"
+    " ORDER BY vr.engagement_score DESC"
+    " LIMIT $2"
+)
+
+
+async def fetch_topic_bundle(topic_id: str, limit: int = 3) -> List[dict]:
+    """
+    Fetch a topic's top video resources with their whitelist status in one query.
+
+    Args:
+        topic_id: Topic UUID.
+        limit: Maximum number of videos to return.
+
+    Returns:
+        List of dicts with keys: youtube_url, youtube_video_id, title,
+        channel_name, engagement_score, whitelisted; highest engagement first.
+    """
+    rows = await get_pool().fetch(_TOPIC_BUNDLE_SQL, topic_id, limit)
+    return [dict(row) for row in rows]
@@ -0,0 +1,19 @@
+from fastapi import APIRouter
+
+from app.agents.scout_agent import flush_scout_cache
+from app.repositories.channel_whitelist_repository import invalidate_active_channel_ids
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+
+@router.post("/flush-scout-cache")
+def flush_scout_cache_endpoint():
+    """Drop cached YouTube scout results so the next requests hit the API."""
+    return {"flushed": flush_scout_cache()}
+
+
+@router.post("/flush-whitelist")
+async def flush_whitelist_endpoint():
+    """Drop the cached active channel whitelist after adding / removing channels."""
+    await invalidate_active_channel_ids()
+    return {"flushed": True}
@@ -2,14 +2,26 @@ import logging
 from typing import List, Optional
 
 from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
 
-from app.models.database import get_supabase_client
+from app.models.fast_db import fast_rpc, fast_select
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/analytics", tags=["analytics"])
 
+# Columns consumed by QuestionPrediction (PostgREST select list, no spaces)
+PREDICTION_COLUMNS = (
+    "question_id,question_text,marks,appearance_count,"
+    "last_appeared_year,prediction_score,study_priority"
+)
+# Columns consumed by SubjectStats
+STATS_COLUMNS = (
+    "subject_id,subject_name,total_questions,"
+    "high_freq_questions,high_freq_percentage"
+)
+
 
 # Response models
 class QuestionPrediction(BaseModel):
@@ -50,8 +62,8 @@ class StudyPlanResponse(BaseModel):
     coverage_estimate: str
 
 
-@router.get("/predictions/subject/{subject_id}")
-def get_predictions_by_subject(
+@router.get("/predictions/subject/{subject_id}", response_model=List[QuestionPrediction])
+async def get_predictions_by_subject(
     subject_id: str,
     scheme_id: str = Query(..., description="Scheme id (e.g. 2019 or 2024)"),
     min_score: float = Query(0.0, ge=0, description="Minimum prediction score"),
@@ -63,54 +75,30 @@ def get_predictions_by_subject(
     Returns predictions sorted by prediction_score DESC.
     """
     try:
-        supabase = get_supabase_client()
-        
-        query = (
-            supabase.table("question_predictions")
-            .select("*")
-            .eq("subject_id", subject_id)
-            .eq("scheme_id", scheme_id)
-            .order("prediction_score", desc=True)
-        )
+        # min_score is filtered in Postgres (gte also drops NULL scores)
+        params = {
+            "select": PREDICTION_COLUMNS,
+            "subject_id": f"eq.{subject_id}",
+            "scheme_id": f"eq.{scheme_id}",
+            "prediction_score": f"gte.{min_score}",
+            "order": "prediction_score.desc",
+        }
         
         if study_priority:
-            query = query.eq("study_priority", study_priority)
+            params["study_priority"] = f"eq.{study_priority}"
         
-        resp = query.execute()
-        
-        if not resp.data:
-            raise HTTPException(
-                status_code=404,
-                detail=f"No predictions found for subject_id={subject_id} and scheme_id={scheme_id}"
-            )
-        
-        # Filter by min_score in Python
-        filtered_data = [
-            row for row in resp.data
-            if row.get("prediction_score") is not None and float(row["prediction_score"]) >= min_score
-        ]
-        
-        if not filtered_data:
-            raise HTTPException(
-                status_code=404,
-                detail=f"No predictions found for subject_id={subject_id} and scheme_id={scheme_id} with min_score={min_score}"
-            )
+        rows = await fast_select("question_predictions", params)
         
-        predictions = []
-        for row in filtered_data:
-            predictions.append(
-                QuestionPrediction(
-                    question_id=row["question_id"],
-                    question_text=row["question_text"],
-                    marks=row["marks"],
-                    appearance_count=row["appearance_count"],
-                    last_appeared_year=row.get("last_appeared_year"),
-                    prediction_score=row["prediction_score"],
-                    study_priority=row.get("study_priority"),
-                )
-            )
+        if not rows:
+            detail = f"No predictions found for subject_id={subject_id} and scheme_id={scheme_id}"
+            if min_score > 0:
+                detail += f" with min_score={min_score}"
+            raise HTTPException(status_code=404, detail=detail)
         
-        return predictions
+        # Rows already have exactly the QuestionPrediction columns, so hand them
+        # straight to orjson; returning a Response skips FastAPI's per-row
+        # validation + jsonable_encoder pass (response_model stays for the docs)
+        return ORJSONResponse(rows)
         
     except HTTPException:
         raise
@@ -122,8 +110,8 @@ def get_predictions_by_subject(
         ) from e
 
 
-@router.get("/stats/subject/{subject_id}")
-def get_subject_stats(
+@router.get("/stats/subject/{subject_id}", response_model=SubjectStats)
+async def get_subject_stats(
     subject_id: str,
     scheme_id: str = Query(..., description="Scheme id (e.g. 2019 or 2024)"),
 ):
@@ -133,30 +121,22 @@ def get_subject_stats(
     Returns aggregated stats from subject_question_stats view.
     """
     try:
-        supabase = get_supabase_client()
-        
-        resp = (
-            supabase.table("subject_question_stats")
-            .select("*")
-            .eq("subject_id", subject_id)
-            .eq("scheme_id", scheme_id)
-            .execute()
+        rows = await fast_select(
+            "subject_question_stats",
+            {
+                "select": STATS_COLUMNS,
+                "subject_id": f"eq.{subject_id}",
+                "scheme_id": f"eq.{scheme_id}",
+            },
         )
         
-        if not resp.data:
+        if not rows:
             raise HTTPException(
                 status_code=404,
                 detail=f"No stats found for subject_id={subject_id} and scheme_id={scheme_id}"
             )
         
-        row = resp.data[0]
-        return SubjectStats(
-            subject_id=row["subject_id"],
-            subject_name=row["subject_name"],
-            total_questions=row["total_questions"],
-            high_freq_questions=row["high_freq_questions"],
-            high_freq_percentage=row["high_freq_percentage"],
-        )
+        return rows[0]
         
     except HTTPException:
         raise
@@ -169,7 +149,7 @@ def get_subject_stats(
 
 
 @router.get("/study-plan/survival/{subject_id}")
-def get_survival_study_plan(
+async def get_survival_study_plan(
     subject_id: str,
     scheme_id: str = Query(..., description="Scheme id (e.g. 2019 or 2024)"),
     hours_available: float = Query(6, ge=0, description="Available study hours"),
@@ -184,60 +164,37 @@ def get_survival_study_plan(
     - Time per question: 10M → 0.75 hr, 5M → 0.4 hr, 2M → 0.15 hr
     """
     try:
-        supabase = get_supabase_client()
-        
-        # Fetch must_study questions ordered by prediction_score DESC
-        resp = (
-            supabase.table("question_predictions")
-            .select("*")
-            .eq("subject_id", subject_id)
-            .eq("scheme_id", scheme_id)
-            .eq("study_priority", "must_study")
-            .order("prediction_score", desc=True)
-            .execute()
+        # Greedy selection runs in Postgres (see select_survival_plan in
+        # schema.sql); only the selected rows come back
+        selected_questions = await fast_rpc(
+            "select_survival_plan",
+            {
+                "p_subject_id": subject_id,
+                "p_scheme_id": scheme_id,
+                "p_hours_available": hours_available,
+            },
         )
         
-        if not resp.data:
-            raise HTTPException(
-                status_code=404,
-                detail=f"No must_study questions found for subject_id={subject_id} and scheme_id={scheme_id}"
+        if not selected_questions:
+            # Empty can also mean nothing fits in hours_available; that is an
+            # empty plan, so 404 only when there are no must_study rows at all
+            must_study = await fast_select(
+                "question_predictions",
+                {
+                    "select": "question_id",
+                    "subject_id": f"eq.{subject_id}",
+                    "scheme_id": f"eq.{scheme_id}",
+                    "study_priority": "eq.must_study",
+                    "limit": "1",
+                },
             )
-        
-        # Time mapping per marks
-        time_per_marks = {
-            10: 0.75,
-            5: 0.4,
-            2: 0.15,
-        }
-        
-        selected_questions = []
-        total_hours = 0.0
-        
-        for row in resp.data:
-            marks = row["marks"]
-            if marks not in time_per_marks:
-                logger.warning(f"Unknown marks value: {marks} for question {row['question_id']}")
-                continue
-            
-            question_hours = time_per_marks[marks]
-            
-            # Check if adding this question would exceed available hours
-            if total_hours + question_hours > hours_available:
-                break
-            
-            total_hours += question_hours
-            selected_questions.append(
-                StudyPlanQuestion(
-                    question_id=row["question_id"],
-                    question_text=row["question_text"],
-                    marks=marks,
-                    appearance_count=row["appearance_count"],
-                    last_appeared_year=row.get("last_appeared_year"),
-                    prediction_score=row["prediction_score"],
-                    study_priority=row["study_priority"],
-                    estimated_hours=question_hours,
+            if not must_study:
+                raise HTTPException(
+                    status_code=404,
+                    detail=f"No must_study questions found for subject_id={subject_id} and scheme_id={scheme_id}"
                 )
-            )
+
+        total_hours = sum(float(row["estimated_hours"]) for row in selected_questions)
         
         return StudyPlanResponse(
             total_questions=len(selected_questions),
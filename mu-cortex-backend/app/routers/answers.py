@@ -1,14 +1,26 @@
-from fastapi import APIRouter, HTTPException
+import logging
+from typing import Tuple
+
+import orjson
+from fastapi import APIRouter, HTTPException, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
-from app.models.database import supabase
 from app.prompts.answer_generator import (
     generate_10_mark_answer_prompt,
     generate_5_mark_answer_prompt,
 )
 from app.repositories.questions_repository import get_question_by_id
-from app.services.llm.gemini_client import generate_text
+from app.services.llm.gemini_client import (
+    GeminiBusyError,
+    generate_text,
+    generate_text_stream,
+)
 from app.services.transcript_service import TranscriptService
+from app.utils.cache import CachePolicy, get_cache, set_cache
+from app.utils.http_cache import NO_STORE
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/answers", tags=["answers"])
 
@@ -18,12 +30,13 @@ class GenerateAnswerRequest(BaseModel):
 
 
 @router.post("/generate")
-async def generate_answer(request: GenerateAnswerRequest):
+async def generate_answer(request: GenerateAnswerRequest, response: Response):
     """
     Generate an answer for a given question using Gemini.
     
     Args:
         request: Request body containing question_id.
+        response: Outgoing response (for headers).
     
     Returns:
         JSON with question_id and generated answer.
@@ -31,14 +44,72 @@ async def generate_answer(request: GenerateAnswerRequest):
     Raises:
         HTTPException 404: If question not found.
         HTTPException 500: If answer generation fails.
+        HTTPException 503: If Gemini is at its concurrency limit.
+    """
+    # Answers are cached server-side; intermediaries must not keep them
+    response.headers["Cache-Control"] = NO_STORE
+
+    # The question fixes marks, topic context and prompt, so the answer is
+    # cached per question and repeat requests skip transcript + Gemini work
+    cache_key = f"answer:{request.question_id}"
+    cached = await get_cache(cache_key)
+    if cached is not None:
+        return {
+            "question_id": request.question_id,
+            "answer": cached
+        }
+
+    prompt, has_context = await _build_prompt(request.question_id)
+
+    try:
+        # Generate answer using Gemini
+        answer = await generate_text(prompt)
+    except GeminiBusyError as e:
+        raise _busy_exception() from e
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to generate answer: {str(e)}"
+        ) from e
+
+    if answer:
+        await set_cache(cache_key, answer, _answer_ttl(has_context))
+
+    return {
+        "question_id": request.question_id,
+        "answer": answer
+    }
+
+
+def _busy_exception() -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="Answer generation is busy, please retry shortly",
+        headers={"Retry-After": "5"},
+    )
+
+
+def _answer_ttl(has_context: bool) -> int:
+    # An answer generated without its topic's transcript (fetch failure or
+    # CONTEXT_TIMEOUT_SECONDS) is only kept briefly so a retry can add context
+    return CachePolicy.LONG if has_context else CachePolicy.SHORT
+
+
+async def _build_prompt(question_id: str) -> Tuple[str, bool]:
+    """
+    Build the Gemini prompt for a question (404 / 400 on bad questions).
+
+    Returns:
+        (prompt, has_context) where has_context is False when the question
+        has a topic but no transcript context could be fetched for it.
     """
     # Fetch question from database
-    question = await get_question_by_id(request.question_id)
+    question = await get_question_by_id(question_id)
     
     if not question:
         raise HTTPException(
             status_code=404,
-            detail=f"Question with id {request.question_id} not found"
+            detail=f"Question with id {question_id} not found"
         )
     
     question_text = question.get("question_text", "")
@@ -48,10 +119,7 @@ async def generate_answer(request: GenerateAnswerRequest):
     # Fetch optional transcript context if topic_id exists
     context = ""
     if topic_id:
-        context = await TranscriptService.get_best_context_for_topic(
-            topic_id,
-            supabase
-        )
+        context = await TranscriptService.get_best_context_for_topic(topic_id)
     
     # Select prompt template based on marks
     if marks == 10:
@@ -63,17 +131,85 @@ async def generate_answer(request: GenerateAnswerRequest):
             status_code=400,
             detail=f"Unsupported marks type: {marks}. Only 5 and 10 marks are supported."
         )
-    
+
+    return prompt, bool(context) or not topic_id
+
+
+def _sse(event: str, data: dict) -> bytes:
+    return b"event: " + event.encode() + b"\ndata: " + orjson.dumps(data) + b"\n\n"
+
+
+@router.post("/generate/stream")
+async def generate_answer_stream(request: GenerateAnswerRequest):
+    """
+    Stream an answer for a given question as Server-Sent Events.
+
+    Emits `chunk` events ({"text": ...}) as Gemini generates, then a `done`
+    event ({"question_id": ...}); a failure mid-stream is reported as an
+    `error` event since the status line has already been sent. Cached
+    answers are replayed through the same events.
+
+    Args:
+        request: Request body containing question_id.
+
+    Returns:
+        text/event-stream response.
+
+    Raises:
+        HTTPException 404: If question not found.
+        HTTPException 500: If answer generation fails before streaming starts.
+        HTTPException 503: If Gemini is at its concurrency limit.
+    """
+    question_id = request.question_id
+    cache_key = f"answer:{question_id}"
+    cached = await get_cache(cache_key)
+
+    if cached is not None:
+        async def _replay():
+            yield _sse("chunk", {"text": cached})
+            yield _sse("done", {"question_id": question_id})
+
+        return StreamingResponse(
+            _replay(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": NO_STORE},
+        )
+
+    prompt, has_context = await _build_prompt(question_id)
+    chunks = generate_text_stream(prompt)
+
+    # Pull the first chunk up front so busy / startup failures still get a
+    # proper status code instead of a 200 with an error event
     try:
-        # Generate answer using Gemini
-        answer = await generate_text(prompt)
-        
-        return {
-            "question_id": request.question_id,
-            "answer": answer
-        }
+        first = await anext(chunks, "")
+    except GeminiBusyError as e:
+        raise _busy_exception() from e
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Failed to generate answer: {str(e)}"
         ) from e
+
+    async def _events():
+        parts = [first]
+        if first:
+            yield _sse("chunk", {"text": first})
+        try:
+            async for text in chunks:
+                parts.append(text)
+                yield _sse("chunk", {"text": text})
+        except Exception as e:
+            logger.error(f"Answer stream failed for {question_id}: {str(e)}", exc_info=True)
+            yield _sse("error", {"detail": f"Failed to generate answer: {str(e)}"})
+            return
+
+        answer = "".join(parts).strip()
+        if answer:
+            await set_cache(cache_key, answer, _answer_ttl(has_context))
+        yield _sse("done", {"question_id": question_id})
+
+    return StreamingResponse(
+        _events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": NO_STORE},
+    )
@@ -1,26 +1,62 @@
-from fastapi import APIRouter, HTTPException, Query
+import logging
 
-from app.models.database import supabase
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+
+from app.db.pool import get_pool
+from app.utils.cache import CachePolicy, get_cache, get_stale, set_cache
+from app.utils.http_cache import (
+    SUBJECTS_CACHE_CONTROL,
+    cached_response,
+    compute_etag,
+    encode,
+)
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/subjects", tags=["subjects"])
 
 
+def _subjects_response(request: Request, entry: dict) -> Response:
+    return cached_response(
+        request, entry["subjects"], SUBJECTS_CACHE_CONTROL, etag=entry["etag"]
+    )
+
+
 @router.get("")
-def list_subjects(
+async def list_subjects(
+    request: Request,
     scheme_id: str = Query(..., description="Scheme id (e.g. 2019 or 2024)"),
     semester: int = Query(..., ge=1, le=8),
     branch: str = Query(..., min_length=1),
 ):
+    # Entries hold the listing and its ETag, so hits and 304s never re-hash
+    cache_key = f"subjects:{scheme_id}:{semester}:{branch}"
+    cached = await get_cache(cache_key)
+    if cached is not None:
+        return _subjects_response(request, cached)
+
     try:
-        resp = (
-            supabase.table("subjects")
-            .select("*")
-            .eq("scheme_id", scheme_id)
-            .eq("semester", semester)
-            .eq("branch", branch)
-            .execute()
+        # asyncpg returns UUID / datetime objects; cast them to the text
+        # PostgREST used to send so the rows stay JSON-encodable
+        rows = await get_pool().fetch(
+            "SELECT id::text AS id, name, code, scheme_id, semester, branch,"
+            " syllabus_pdf_url,"
+            " to_json(created_at) #>> '{}' AS created_at,"
+            " to_json(updated_at) #>> '{}' AS updated_at"
+            " FROM public.subjects"
+            " WHERE scheme_id = $1 AND semester = $2 AND branch = $3",
+            scheme_id,
+            semester,
+            branch,
         )
-        return resp.data or []
     except Exception as e:
+        stale = await get_stale(cache_key)
+        if stale is not None:
+            logger.warning(f"Serving stale subjects for {cache_key}: {str(e)}")
+            return _subjects_response(request, stale)
         raise HTTPException(status_code=500, detail="Failed to fetch subjects") from e
 
+    subjects = [dict(row) for row in rows]
+    entry = {"etag": compute_etag(encode(subjects)), "subjects": subjects}
+    await set_cache(cache_key, entry, CachePolicy.DAY)
+    return _subjects_response(request, entry)
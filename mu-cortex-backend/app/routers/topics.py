@@ -1,8 +1,11 @@
 import logging
-from collections import defaultdict
-from fastapi import APIRouter, HTTPException, Query
+from itertools import groupby
+from operator import itemgetter
+from fastapi import APIRouter, HTTPException, Query, Request
 
-from app.models.database import supabase
+from app.db.pool import get_pool
+from app.utils.cache import CachePolicy, get_cache, get_stale, set_cache
+from app.utils.http_cache import TOPICS_CACHE_CONTROL, cached_response
 
 logger = logging.getLogger(__name__)
 
@@ -10,62 +13,58 @@ router = APIRouter(prefix="/topics", tags=["topics"])
 
 
 @router.get("")
-def get_topics(
+async def get_topics(
+    request: Request,
     subject_id: str = Query(..., description="Subject UUID"),
     scheme_id: str = Query(..., description="Scheme id (e.g. 2019 or 2024)"),
 ):
     """
     Fetch topics for a subject, grouped by module_number.
     
-    Returns topics ordered by module_number ASC, grouped into modules.
+    Returns topics ordered by module_number ASC (then name), grouped into modules.
     """
+    cache_key = f"topics:{subject_id}:{scheme_id}"
+    cached = await get_cache(cache_key)
+    if cached is not None:
+        return cached_response(request, cached, TOPICS_CACHE_CONTROL)
+
     try:
         # 1. Verify subject exists for given subject_id and scheme_id
-        subject_resp = (
-            supabase.table("subjects")
-            .select("id, name")
-            .eq("id", subject_id)
-            .eq("scheme_id", scheme_id)
-            .execute()
+        pool = get_pool()
+        subject = await pool.fetchrow(
+            "SELECT id, name FROM public.subjects WHERE id = $1::uuid AND scheme_id = $2",
+            subject_id,
+            scheme_id,
         )
         
-        if not subject_resp.data:
+        if subject is None:
             logger.warning(f"Subject not found: subject_id={subject_id}, scheme_id={scheme_id}")
             raise HTTPException(
                 status_code=404,
                 detail=f"Subject not found for subject_id={subject_id} and scheme_id={scheme_id}"
             )
         
-        subject = subject_resp.data[0]
         subject_name = subject["name"]
         
-        # 2. Fetch all topics for that subject from topics table
-        topics_resp = (
-            supabase.table("topics")
-            .select("id, name, module_number")
-            .eq("subject_id", subject_id)
-            .order("module_number", desc=False)  # Order by module_number ASC
-            .execute()
+        # 2. Fetch all topics for that subject from topics table,
+        # already ordered so modules can be grouped in one pass
+        topics = await pool.fetch(
+            "SELECT id::text AS id, name, module_number FROM public.topics"
+            " WHERE subject_id = $1::uuid"
+            " ORDER BY module_number ASC, name ASC",
+            subject_id,
         )
         
-        topics = topics_resp.data or []
-        
-        # 3. Group topics by module_number
-        modules_dict = defaultdict(list)
-        for topic in topics:
-            module_num = topic["module_number"]
-            modules_dict[module_num].append({
-                "id": topic["id"],
-                "name": topic["name"]
-            })
-        
-        # 4. Build response with modules sorted by module_number
+        # 3. Group consecutive rows by module_number (modules come out sorted)
         modules = [
             {
                 "module_number": module_num,
-                "topics": topics_list
+                "topics": [
+                    {"id": topic["id"], "name": topic["name"]}
+                    for topic in module_topics
+                ]
             }
-            for module_num, topics_list in sorted(modules_dict.items())
+            for module_num, module_topics in groupby(topics, key=itemgetter("module_number"))
         ]
         
         response = {
@@ -76,10 +75,15 @@ def get_topics(
         }
         
         logger.info(f"Fetched {len(topics)} topics for subject_id={subject_id}")
-        return response
+        await set_cache(cache_key, response, CachePolicy.SHORT)
+        return cached_response(request, response, TOPICS_CACHE_CONTROL)
         
     except HTTPException:
         raise
     except Exception as e:
+        stale = await get_stale(cache_key)
+        if stale is not None:
+            logger.warning(f"Serving stale topics for subject_id={subject_id}: {e}")
+            return cached_response(request, stale, TOPICS_CACHE_CONTROL)
         logger.error(f"Failed to fetch topics: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Failed to fetch topics") from e
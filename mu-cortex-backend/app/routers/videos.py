@@ -1,43 +1,54 @@
 # Phase 2 Scout logic frozen — do not modify without review
-# from fastapi import APIRouter, Query
-
-# from app.agents.scout_agent import get_videos_for_topic
-# from app.utils.cache import get_cached_videos, set_cached_videos
+import asyncio
+import heapq
+import logging
+from operator import itemgetter
+from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+import orjson
+from pydantic import TypeAdapter
+from app.agents.scout_agent import fetch_videos_stream, scout_run
+from app.models.database import supabase
+from app.models.schemas import ScoutVideo
+from app.repositories.channel_whitelist_repository import get_active_channel_ids
+from app.services.transcript_service import extract_video_ids
+from app.utils.cache import CachePolicy, get_stale, single_flight
+from app.utils.http_cache import VIDEOS_CACHE_CONTROL, cached_response
 
-# router = APIRouter(prefix="/videos", tags=["videos"])
+logger = logging.getLogger(__name__)
 
+router = APIRouter(prefix="/videos", tags=["videos"])
 
-# @router.get("")
-# def list_videos(
-#     topic_id: str = Query(..., min_length=1),
-#     limit: int = Query(10, ge=1, le=100),
-# ):
-#     cached = get_cached_videos(topic_id)
-#     if cached is not None:
-#         return cached
+MAX_WHITELIST_PER_CHANNEL = 3
+GLOBAL_MAX_RESULTS = 17
 
-#     # Stubbed agent call (returns empty list for now)
-#     videos = get_videos_for_topic(topic_id=topic_id, limit=limit)
-#     set_cached_videos(topic_id, videos)
-#     return videos
+# Compiled once; validates the ranked list in one call and drops extra keys
+_scout_videos_adapter = TypeAdapter(List[ScoutVideo])
 
-from typing import Optional
-from fastapi import APIRouter, Query
-from app.agents.scout_agent import fetch_videos_from_channel, fetch_videos_from_global_search
-from app.models.database import supabase
-from app.utils.cache import get_cache, set_cache
 
-router = APIRouter(prefix="/videos", tags=["videos"])
+async def _resolve_search_query(topic_id: str, query: Optional[str]) -> str:
+    """Use the provided query, or fall back to the topic name (then topic_id)."""
+    if query is not None:
+        return query
 
+    # Supabase calls are blocking, so they run in the default executor
+    topic_resp = await asyncio.to_thread(
+        lambda: supabase.table("topics")
+        .select("name")
+        .eq("id", topic_id)
+        .execute(),
+    )
 
-def extract_video_id(youtube_url: str) -> str:
-    """Extract video ID from YouTube URL."""
-    # Format: https://www.youtube.com/watch?v={vid}
-    return youtube_url.split("v=")[-1] if "v=" in youtube_url else youtube_url
+    if not topic_resp.data:
+        # If topic not found, fallback to topic_id as query
+        return topic_id
+    return topic_resp.data[0]["name"]
 
 
 @router.get("/")
-def get_videos(
+async def get_videos(
+    request: Request,
     topic_id: str,
     limit: int = 10,
     query: Optional[str] = Query(
@@ -45,75 +56,75 @@ def get_videos(
         description="Optional search query override (e.g. 'bankers algorithm deadlock')"
     ),
 ):
-    # query is the YouTube search intent; topic_id is for caching + DB integrity
-    
-    # Determine search query: use provided query or fetch topic name from DB
-    if query is None:
-        # Fetch topic name from database
-        topic_resp = (
-            supabase.table("topics")
-            .select("name")
-            .eq("id", topic_id)
-            .execute()
-        )
-        
-        if not topic_resp.data:
-            # If topic not found, fallback to topic_id as query
-            search_query = topic_id
-        else:
-            search_query = topic_resp.data[0]["name"]
-    else:
-        search_query = query
-    
     # Build cache key: include query if provided
     if query:
         cache_key = f"videos:{topic_id}:{query.lower()}"
     else:
         cache_key = f"videos:{topic_id}"
 
-    # 1. check cache
-    cached = get_cache(cache_key)
-    if cached:
-        return {
-            "cached": True,
-            **cached
-        }
+    async def _scout():
+        # query is the YouTube search intent; topic_id is for caching + DB integrity
+        search_query = await _resolve_search_query(topic_id, query)
+        return await _build_videos_payload(topic_id, search_query, limit)
+
+    # 1. check cache (before any DB work, so hot topics cost one GET);
+    # on a miss only one request per key runs the scout, the rest await it
+    try:
+        payload, cached = await single_flight(cache_key, _scout, CachePolicy.LONG)
+    except Exception as e:
+        # Upstream (Supabase / YouTube) failed: serve the last good result if any
+        stale = await get_stale(cache_key)
+        if stale is None:
+            logger.error(f"Failed to fetch videos for topic {topic_id}: {str(e)}", exc_info=True)
+            raise HTTPException(status_code=500, detail="Failed to fetch videos") from e
+        logger.warning(f"Serving stale videos for topic {topic_id}: {str(e)}")
+        return cached_response(
+            request,
+            {
+                "cached": True,
+                "stale": True,
+                **stale
+            },
+            VIDEOS_CACHE_CONTROL,
+        )
 
-    # 2. fetch active channels
-    response = supabase.table("channel_whitelist") \
-        .select("channel_id") \
-        .eq("status", "active") \
-        .execute()
+    return cached_response(
+        request,
+        {
+            "cached": cached,
+            **payload
+        },
+        VIDEOS_CACHE_CONTROL,
+    )
 
-    channels = response.data
-    whitelisted_channel_ids = {ch["channel_id"] for ch in channels}
 
-    all_videos = []
+async def _build_videos_payload(
+    topic_id: str,
+    search_query: str,
+    limit: int,
+) -> dict:
+    """Scout, dedupe and rank videos for search_query (cache-miss path of GET /videos)."""
+    # 2. fetch active channels (memoized frozenset, shared across requests)
+    whitelisted_channel_ids = await get_active_channel_ids()
 
     # 3. scout youtube from whitelisted channels (priority base)
-    MAX_WHITELIST_PER_CHANNEL = 3
-    for channel in channels:
-        videos = fetch_videos_from_channel(
-            query=search_query,
-            channel_id=channel["channel_id"],
-            max_results=MAX_WHITELIST_PER_CHANNEL,
-        )
-        all_videos.extend(videos)
-
     # 4. scout youtube from global search (any channel, excluding whitelisted)
-    # Target: ~20 total candidates (whitelisted + global combined)
-    global_videos = fetch_videos_from_global_search(
+    # Both phases run concurrently; target: ~20 total candidates
+    # (whitelisted + global combined)
+    all_videos = await scout_run(
         query=search_query,
-        max_results=17,
-        exclude_channel_ids=whitelisted_channel_ids,
+        channel_ids=whitelisted_channel_ids,
+        max_per_channel=MAX_WHITELIST_PER_CHANNEL,
+        global_max_results=GLOBAL_MAX_RESULTS,
     )
-    all_videos.extend(global_videos)
 
     # 5. deduplicate by video ID
     # If duplicate video_id exists, keep the entry with higher engagement_score
     video_map = {}
-    for video in all_videos:
-        vid_id = extract_video_id(video["youtube_url"])
+    urls = [video["youtube_url"] for video in all_videos]
+    for video, url, vid_id in zip(all_videos, urls, extract_video_ids(urls)):
+        # Fall back to the URL itself so unrecognised URLs still dedupe
+        vid_id = vid_id or url
         
         if vid_id not in video_map:
             video_map[vid_id] = video
@@ -123,85 +134,95 @@ def get_videos(
                 video_map[vid_id] = video
 
     deduplicated_videos = list(video_map.values())
-    
-    # 6. Compute relevance_score for internal ranking
-    # relevance_score represents how well the video matches the search query
-    # It's a separate metric from engagement_score, used for internal ranking only
+
+    # 6–8 in one pass per video. Order of operations per video:
+    # base score → relevance adjustment → whitelist boost
     search_query_lower = search_query.lower()
     for video in deduplicated_videos:
-        # Start with relevance_score = 0.0
-        relevance_score = 0.0
-        
+        # 6. relevance_score represents how well the video matches the search
+        # query; a separate metric from engagement_score, used for ranking only.
         # Safely check title and description (handle missing fields)
         title = video.get("title", "")
         description = video.get("description", "")
-        
+
         if title and search_query_lower in title.lower():
-            # Search query found in title: add 1.0 to relevance_score
-            relevance_score += 1.0
+            # Search query found in title
+            relevance_score = 1.0
         elif description and search_query_lower in description.lower():
-            # Search query found in description: add 0.5 to relevance_score
-            relevance_score += 0.5
-        
-        # Attach relevance_score to video object (internal use only)
-        video["relevance_score"] = relevance_score
-    
-    # 7. Apply relevance-based ranking adjustment
-    # Order of operations: base score → relevance adjustment → whitelist boost
-    # Relevance is applied before whitelist boost to ensure irrelevant videos
-    # are demoted even if they come from whitelisted channels.
-    # Whitelist should never rescue an irrelevant video (relevance_score == 0).
-    # We use demotion (0.3x) instead of exclusion to maintain soft filtering
-    # and allow edge cases where a video might still be useful despite no keyword match.
-    for video in deduplicated_videos:
-        # a) Base score = engagement_score
+            # Search query found in description
+            relevance_score = 0.5
+        else:
+            relevance_score = 0.0
+
+        # 7. Relevance adjustment, applied before the whitelist boost so
+        # irrelevant videos are demoted even from whitelisted channels.
+        # Whitelist should never rescue an irrelevant video (relevance_score == 0).
+        # We use demotion (0.3x) instead of exclusion to maintain soft filtering
+        # and allow edge cases where a video might still be useful despite no keyword match.
         base_score = video["engagement_score"]
-        relevance_score = video.get("relevance_score", 0.0)
-        
-        # b) Apply relevance adjustment
         if relevance_score > 0:
-            # Video has relevance: boost score by (1 + relevance_score)
-            # e.g. relevance_score 1.0 → 2x multiplier, 1.5 → 2.5x multiplier
-            video["engagement_score"] = int(base_score * (1 + relevance_score))
+            # e.g. relevance_score 1.0 → 2x multiplier, 0.5 → 1.5x multiplier
+            score = int(base_score * (1 + relevance_score))
         else:
-            # relevance_score == 0: apply strong demotion (0.3x)
-            # This demotes irrelevant videos but doesn't exclude them entirely
-            video["engagement_score"] = int(base_score * 0.3)
-    
-    # 8. Apply whitelist priority boost LAST (soft signal, not hard filter)
-    # Boost engagement_score by 1.25x for videos from whitelisted channels.
-    # Applied after relevance adjustment so whitelist cannot rescue irrelevant videos.
-    # Whitelist is a bias signal, not dominance - it only provides a small boost
-    # to already-relevant content from trusted sources.
-    for video in deduplicated_videos:
-        channel_id = video.get("channel_id", "")
-        if channel_id in whitelisted_channel_ids:
-            # Apply priority boost: multiply engagement_score by 1.25
-            video["engagement_score"] = int(video["engagement_score"] * 1.25)
-    
-    # 9. Rank by engagement_score (highest first)
-    ranked_videos = sorted(
+            score = int(base_score * 0.3)
+
+        # 8. Whitelist priority boost LAST (soft signal, not hard filter):
+        # a small 1.25x bias towards already-relevant content from trusted sources
+        if video.get("channel_id", "") in whitelisted_channel_ids:
+            score = int(score * 1.25)
+
+        video["engagement_score"] = score
+
+    # 9. Rank by engagement_score (highest first); nlargest is O(N log limit)
+    # and keeps sorted()'s order for ties
+    ranked_videos = heapq.nlargest(
+        limit,
         deduplicated_videos,
-        key=lambda v: v.get("engagement_score", 0),
-        reverse=True,
-    )[:limit]
-
-    # 10. Remove internal fields before API response
-    # relevance_score is for internal ranking only, not exposed in API
-    for video in ranked_videos:
-        video.pop("relevance_score", None)
+        key=itemgetter("engagement_score"),
+    )
+
+    # 10. Normalise to the API shape; ScoutVideo ignores extra keys, so any
+    # internal fields on the scouted dicts are dropped here
+    ranked_videos = _scout_videos_adapter.dump_python(
+        _scout_videos_adapter.validate_python(ranked_videos)
+    )
     
     payload = {
         "topic_id": topic_id,
-        "total_channels": len(channels),
+        "total_channels": len(whitelisted_channel_ids),
         "videos_found": len(ranked_videos),
         "videos": ranked_videos,
     }
 
-    # 11. store in cache
-    set_cache(cache_key, payload)
+    return payload
 
-    return {
-        "cached": False,
-        **payload
-    }
+
+@router.get("/stream")
+async def stream_videos(
+    topic_id: str,
+    query: Optional[str] = Query(
+        None,
+        description="Optional search query override (e.g. 'bankers algorithm deadlock')"
+    ),
+):
+    """
+    Stream unranked scout candidates as NDJSON, one line per phase.
+
+    Each line is {"phase": "whitelist" | "global", "videos": [...]} and is sent
+    as soon as that phase's search and statistics land, so the UI can render
+    whitelisted results before a slow global search finishes. Final ranking
+    still comes from GET /videos.
+    """
+    search_query = await _resolve_search_query(topic_id, query)
+    channel_ids = await get_active_channel_ids()
+
+    async def _lines():
+        async for phase, videos in fetch_videos_stream(
+            search_query,
+            channel_ids,
+            max_per_channel=MAX_WHITELIST_PER_CHANNEL,
+            global_max_results=GLOBAL_MAX_RESULTS,
+        ):
+            yield orjson.dumps({"phase": phase, "videos": videos}) + b"\n"
+
+    return StreamingResponse(_lines(), media_type="application/x-ndjson")
@@ -4,49 +4,89 @@ Gemini LLM client for answer generation.
 This module provides a reusable async interface to Google's Gemini 2.5 Flash model
 for generating text responses in the MU-Cortex backend.
 """
-import os
-from typing import Optional
+import asyncio
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Optional
 
-from dotenv import load_dotenv
 import google.generativeai as genai
 
-# Load environment variables from backend .env file
-# Path: mu-cortex-backend/.env
-env_path = os.path.join(os.path.dirname(__file__), "..", "..", "..", ".env")
-load_dotenv(env_path)
-
-# Also check root .env (where GEMINI_API_KEY might be stored)
-root_env_path = os.path.join(os.path.dirname(__file__), "..", "..", "..", "..", ".env")
-load_dotenv(root_env_path, override=False)
-
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-
-if not GEMINI_API_KEY:
-    raise RuntimeError(
-        "Missing environment variable: GEMINI_API_KEY. "
-        "Please set it in .env file (root or mu-cortex-backend/.env)"
-    )
-
-# Configure Gemini
-genai.configure(api_key=GEMINI_API_KEY)
+from app.config import settings
+from app.utils.cache import CachePolicy, get_cache, set_cache
 
 # Initialize the model: Gemini 2.5 Flash
 MODEL_NAME = "gemini-2.5-flash"
 _model: Optional[genai.GenerativeModel] = None
 
+# Bound concurrent Gemini calls per worker: they run in their own thread pool
+# so slow generations can't starve the default executor other endpoints use,
+# and callers that can't get a slot within the queue budget fail fast
+GEMINI_CONCURRENCY = settings.GEMINI_CONCURRENCY
+GEMINI_QUEUE_TIMEOUT_SECONDS = 10.0
+_GEMINI_SEM = asyncio.Semaphore(GEMINI_CONCURRENCY)
+_gemini_executor = ThreadPoolExecutor(
+    max_workers=GEMINI_CONCURRENCY,
+    thread_name_prefix="gemini",
+)
+
+
+class GeminiBusyError(RuntimeError):
+    """Raised when no Gemini slot frees up within GEMINI_QUEUE_TIMEOUT_SECONDS."""
+
 
 def _get_model() -> genai.GenerativeModel:
-    """Get or create the Gemini model instance."""
+    """
+    Get or create the Gemini model instance (one per worker process).
+
+    Gemini is configured here on first use, so importing this module has no
+    side effects.
+
+    Raises:
+        RuntimeError: If GEMINI_API_KEY is not set.
+    """
     global _model
     if _model is None:
+        if not settings.GEMINI_API_KEY:
+            raise RuntimeError(
+                "Missing environment variable: GEMINI_API_KEY. "
+                "Please set it in .env file (root or mu-cortex-backend/.env)"
+            )
+        genai.configure(api_key=settings.GEMINI_API_KEY)
         _model = genai.GenerativeModel(MODEL_NAME)
     return _model
 
 
+def _prompt_cache_key(prompt: str) -> str:
+    # Whitespace runs are collapsed for the key only (the model still gets the
+    # prompt verbatim), so e.g. trailing spaces in a question still hit
+    canonical = " ".join(prompt.split())
+    return "gemini:" + hashlib.blake2b(canonical.encode(), digest_size=16).hexdigest()
+
+
+def _gemini_error(e: Exception) -> RuntimeError:
+    error_msg = str(e)
+    if "API_KEY" in error_msg or "api key" in error_msg.lower():
+        return RuntimeError(
+            "Gemini API key is invalid or missing. "
+            "Please check your GEMINI_API_KEY environment variable."
+        )
+    return RuntimeError(f"Failed to generate text with Gemini: {error_msg}")
+
+
+async def _acquire_slot() -> None:
+    try:
+        await asyncio.wait_for(_GEMINI_SEM.acquire(), GEMINI_QUEUE_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError as e:
+        raise GeminiBusyError("Too many concurrent Gemini requests") from e
+
+
 async def generate_text(prompt: str) -> str:
     """
     Generate text using Gemini 2.5 Flash model.
 
+    Responses are cached by prompt hash, so an identical prompt skips the
+    model call entirely.
+
     Args:
         prompt: The complete prompt string to send to the model.
 
@@ -54,36 +94,118 @@ async def generate_text(prompt: str) -> str:
         The generated text response as a string, with leading/trailing whitespace stripped.
 
     Raises:
+        GeminiBusyError: If GEMINI_CONCURRENCY calls are already in flight
+            and none finishes within GEMINI_QUEUE_TIMEOUT_SECONDS.
         RuntimeError: If the API key is missing or if the API call fails.
         Exception: For other API-related errors (network, rate limits, etc.).
     """
     if not prompt or not prompt.strip():
         raise ValueError("Prompt cannot be empty")
 
+    cache_key = _prompt_cache_key(prompt)
+    cached = await get_cache(cache_key)
+    if cached is not None:
+        return cached
+
+    await _acquire_slot()
     try:
         model = _get_model()
         
         # Generate content (async-friendly, but genai uses sync calls)
         # We'll run it in a thread pool for true async behavior
-        import asyncio
-        
         def _generate_sync():
             response = model.generate_content(prompt)
             return response.text
         
-        # Run the sync call in a thread pool to avoid blocking
-        loop = asyncio.get_event_loop()
-        text = await loop.run_in_executor(None, _generate_sync)
+        # Run the sync call in the dedicated Gemini pool to avoid blocking
+        loop = asyncio.get_running_loop()
+        text = await loop.run_in_executor(_gemini_executor, _generate_sync)
         
         # Strip whitespace and return
-        return text.strip() if text else ""
+        text = text.strip() if text else ""
         
     except Exception as e:
         # Re-raise with a cleaner error message
-        error_msg = str(e)
-        if "API_KEY" in error_msg or "api key" in error_msg.lower():
-            raise RuntimeError(
-                "Gemini API key is invalid or missing. "
-                "Please check your GEMINI_API_KEY environment variable."
-            ) from e
-        raise RuntimeError(f"Failed to generate text with Gemini: {error_msg}") from e
+        raise _gemini_error(e) from e
+    finally:
+        _GEMINI_SEM.release()
+
+    # Empty generations are not cached so the next request retries
+    if text:
+        await set_cache(cache_key, text, CachePolicy.LONG)
+    return text
+
+
+# Cached text is replayed in slices of this size so streaming clients see the
+# same incremental contract on a hit as on a live generation
+STREAM_REPLAY_CHUNK_CHARS = 256
+_STREAM_DONE = object()
+
+
+async def generate_text_stream(prompt: str) -> AsyncIterator[str]:
+    """
+    Stream text from Gemini 2.5 Flash as it is generated.
+
+    The full text is written to the same prompt-hash cache as generate_text
+    once the stream completes; a cache hit is replayed in slices.
+
+    Args:
+        prompt: The complete prompt string to send to the model.
+
+    Yields:
+        Text chunks in generation order.
+
+    Raises:
+        GeminiBusyError: If no Gemini slot frees up in time (before any chunk).
+        RuntimeError: If the API call fails.
+    """
+    if not prompt or not prompt.strip():
+        raise ValueError("Prompt cannot be empty")
+
+    cache_key = _prompt_cache_key(prompt)
+    cached = await get_cache(cache_key)
+    if cached is not None:
+        for i in range(0, len(cached), STREAM_REPLAY_CHUNK_CHARS):
+            yield cached[i:i + STREAM_REPLAY_CHUNK_CHARS]
+        return
+
+    await _acquire_slot()
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+
+    def _put(item) -> None:
+        loop.call_soon_threadsafe(queue.put_nowait, item)
+
+    def _generate_sync():
+        # The SDK's stream is a blocking iterator; hand chunks to the loop
+        try:
+            for chunk in _get_model().generate_content(prompt, stream=True):
+                try:
+                    text = chunk.text
+                except ValueError:
+                    # Chunk without text parts (e.g. safety metadata only)
+                    continue
+                if text:
+                    _put(text)
+        except Exception as e:
+            _put(e)
+        finally:
+            _put(_STREAM_DONE)
+
+    future = loop.run_in_executor(_gemini_executor, _generate_sync)
+    # The slot is held until the thread finishes, even if the client goes away
+    future.add_done_callback(lambda _: _GEMINI_SEM.release())
+
+    parts = []
+    while True:
+        item = await queue.get()
+        if item is _STREAM_DONE:
+            break
+        if isinstance(item, Exception):
+            raise _gemini_error(item) from item
+        parts.append(item)
+        yield item
+
+    text = "".join(parts).strip()
+    if text:
+        await set_cache(cache_key, text, CachePolicy.LONG)
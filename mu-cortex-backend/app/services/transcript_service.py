@@ -6,45 +6,98 @@ and get the best context from video resources for a given topic.
 """
 import asyncio
 import re
-from typing import Optional
+from typing import List, Optional
 
-from youtube_transcript_api import YouTubeTranscriptApi
-from youtube_transcript_api._errors import (
-    TranscriptsDisabled,
+import requests
+from requests.adapters import HTTPAdapter
+from youtube_transcript_api import (
     NoTranscriptFound,
+    TranscriptsDisabled,
     VideoUnavailable,
+    YouTubeTranscriptApi,
 )
 
+from app.repositories.video_resources_repository import fetch_topic_bundle
 
-class TranscriptService:
-    """Service for fetching and processing YouTube transcripts."""
+# Compiled once; video ids are extracted for every scouted candidate
+_YT_ID_RE = re.compile(
+    r'(?:youtube\.com/watch\?v=|youtu\.be/|youtube\.com/embed/|youtube\.com/v/)([A-Za-z0-9_-]{11})'
+)
 
-    @staticmethod
-    def extract_video_id(youtube_url: str) -> Optional[str]:
-        """
-        Extract video ID from various YouTube URL formats.
+# A stalled transcript fetch must not hold up answer generation
+CONTEXT_TIMEOUT_SECONDS = 5.0
+
+# Caps transcript fetches in the default thread pool across all requests
+TRANSCRIPT_CONCURRENCY = 16
+_TRANSCRIPT_SEM = asyncio.Semaphore(TRANSCRIPT_CONCURRENCY)
+
+# Without an http_client, YouTubeTranscriptApi opens a fresh requests.Session
+# (new TCP + TLS handshakes) per instance; one client on a shared session
+# keeps connections to youtube.com alive. Sized to the semaphore so every
+# fetch gets a connection.
+_session: Optional[requests.Session] = None
+_api: Optional[YouTubeTranscriptApi] = None
+
+
+def _get_api() -> YouTubeTranscriptApi:
+    global _session, _api
+    if _api is None:
+        _session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=TRANSCRIPT_CONCURRENCY,
+            pool_maxsize=TRANSCRIPT_CONCURRENCY,
+        )
+        _session.mount("https://", adapter)
+        _api = YouTubeTranscriptApi(http_client=_session)
+    return _api
+
+
+def close_transcript_session() -> None:
+    """Close the shared transcript HTTP session (call on app shutdown)."""
+    global _session, _api
+    if _session is not None:
+        _session.close()
+        _session = None
+        _api = None
+
+
+def extract_video_id(youtube_url: str) -> Optional[str]:
+    """
+    Extract video ID from various YouTube URL formats.
+
+    Supports:
+    - youtube.com/watch?v=VIDEO_ID
+    - youtu.be/VIDEO_ID
+    - youtube.com/embed/VIDEO_ID
+    - youtube.com/v/VIDEO_ID
+
+    Args:
+        youtube_url: YouTube URL in any supported format.
+
+    Returns:
+        Video ID string or None if not found.
+    """
+    if not youtube_url:
+        return None
+    return m.group(1) if (m := _YT_ID_RE.search(youtube_url)) else None
 
-        Supports:
-        - youtube.com/watch?v=VIDEO_ID
-        - youtu.be/VIDEO_ID
-        - youtube.com/embed/VIDEO_ID
-        - youtube.com/v/VIDEO_ID
 
-        Args:
-            youtube_url: YouTube URL in any supported format.
+def extract_video_ids(youtube_urls: List[str]) -> List[Optional[str]]:
+    """Bulk extract_video_id; None for URLs without a recognisable ID."""
+    search = _YT_ID_RE.search
+    return [
+        m.group(1) if url and (m := search(url)) else None
+        for url in youtube_urls
+    ]
 
-        Returns:
-            Video ID string or None if not found.
-        """
-        if not youtube_url:
-            return None
 
-        # Pattern for youtube.com/watch?v=VIDEO_ID
-        match = re.search(r'(?:youtube\.com/watch\?v=|youtu\.be/|youtube\.com/embed/|youtube\.com/v/)([a-zA-Z0-9_-]{11})', youtube_url)
-        if match:
-            return match.group(1)
+class TranscriptService:
+    """Service for fetching and processing YouTube transcripts."""
 
-        return None
+    @staticmethod
+    def extract_video_id(youtube_url: str) -> Optional[str]:
+        """Extract video ID from a YouTube URL (see module-level extract_video_id)."""
+        return extract_video_id(youtube_url)
 
     @staticmethod
     async def get_transcript(
@@ -68,10 +121,13 @@ class TranscriptService:
         if not video_id:
             return None
 
+        # Resolved on the event loop so worker threads never race to create it
+        api = _get_api()
+
         def _fetch_sync():
             try:
                 # Try manual transcripts first (en, hi)
-                transcript_list = YouTubeTranscriptApi.list_transcripts(video_id)
+                transcript_list = api.list(video_id)
                 
                 transcript = None
                 try:
@@ -95,8 +151,15 @@ class TranscriptService:
                 # Fetch transcript data
                 transcript_data = transcript.fetch()
                 
-                # Concatenate text
-                text_parts = [item['text'] for item in transcript_data]
+                # Concatenate text, stopping once the joined length passes
+                # max_length: the rest of a long lecture would only be cut off
+                text_parts = []
+                total = -1  # no separator before the first part
+                for snippet in transcript_data:
+                    text_parts.append(snippet.text)
+                    total += len(snippet.text) + 1
+                    if total > max_length:
+                        break
                 full_text = ' '.join(text_parts)
                 
                 # Truncate to max_length
@@ -109,23 +172,21 @@ class TranscriptService:
                 return None
 
         # Run in executor to avoid blocking
-        loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(None, _fetch_sync)
+        async with _TRANSCRIPT_SEM:
+            return await asyncio.to_thread(_fetch_sync)
 
     @staticmethod
-    async def get_best_context_for_topic(
-        topic_id: str,
-        supabase_client
-    ) -> str:
+    async def get_best_context_for_topic(topic_id: str) -> str:
         """
         Get the best transcript context for a topic from video resources.
 
         Queries video_resources table, orders by engagement_score DESC,
-        tries to fetch transcripts from top 3 videos, returns first successful.
+        fetches transcripts for the top 3 videos concurrently and returns
+        the highest-ranked one that has a transcript, preferring videos
+        from whitelisted channels.
 
         Args:
             topic_id: Topic UUID.
-            supabase_client: Supabase client instance.
 
         Returns:
             Formatted context string: "[Context from: VIDEO_TITLE]\n\nTRANSCRIPT"
@@ -135,33 +196,40 @@ class TranscriptService:
             return ""
 
         try:
-            # Query video_resources for this topic
-            resp = (
-                supabase_client.table("video_resources")
-                .select("youtube_url, title")
-                .eq("topic_id", topic_id)
-                .order("engagement_score", desc=True)
-                .limit(3)
-                .execute()
-            )
-
-            videos = resp.data or []
+            # Top 3 video_resources for this topic, one round trip
+            videos = await fetch_topic_bundle(topic_id, limit=3)
             if not videos:
                 return ""
+            # Whitelisted channels first; sorted() is stable, so engagement
+            # order is kept within each group
+            videos = sorted(videos, key=lambda video: not video["whitelisted"])
+
+            # Fetch all transcripts concurrently, but still prefer videos in
+            # engagement order: the wait ends as soon as the best-ranked
+            # video with a transcript is known, not after sum(rtt)
+            tasks = [
+                (
+                    video["title"] or "Unknown Video",
+                    asyncio.create_task(
+                        TranscriptService.get_transcript(video["youtube_url"])
+                    ),
+                )
+                for video in videos
+                if video["youtube_url"]
+            ]
+
+            async def _best_in_order() -> str:
+                for title, task in tasks:
+                    transcript = await task
+                    if transcript:
+                        return f"[Context from: {title}]\n\n{transcript}"
+                return ""
 
-            # Try to fetch transcript from videos in order
-            for video in videos:
-                youtube_url = video.get("youtube_url")
-                title = video.get("title", "Unknown Video")
-
-                if not youtube_url:
-                    continue
-
-                transcript = await TranscriptService.get_transcript(youtube_url)
-                if transcript:
-                    return f"[Context from: {title}]\n\n{transcript}"
-
-            return ""
+            try:
+                return await asyncio.wait_for(_best_in_order(), CONTEXT_TIMEOUT_SECONDS)
+            finally:
+                for _, task in tasks:
+                    task.cancel()
 
         except Exception:
             return ""
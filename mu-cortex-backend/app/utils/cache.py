@@ -1,48 +1,94 @@
-# from __future__ import annotations
+"""
+Response cache shared by all uvicorn workers.
+
+Backed by Redis when REDIS_URL is set (cache-aside, GET/SETEX with orjson
+payloads); otherwise falls back to an in-process dict so local development
+needs no Redis. Configure the Redis server with
+`maxmemory-policy allkeys-lfu` so hot topics survive memory pressure.
+
+Every set also writes a long-lived `stale:` copy, which endpoints can serve
+when the upstream (Supabase / YouTube) fails instead of returning a 500.
+"""
+import asyncio
+import logging
+import os
+import random
+import time
+from enum import IntEnum
+from typing import Any, Awaitable, Callable, Optional, Tuple
 
-# from datetime import datetime, timedelta, timezone
-# from typing import Any
+import orjson
+from dotenv import load_dotenv
 
-# _CACHE_TTL = timedelta(days=7)
+try:
+    import redis.asyncio as redis
+except ImportError:  # optional; REDIS_URL then has no effect
+    redis = None
 
-# # cache[topic_id] = {"videos": [...], "expires_at": datetime}
-# cache: dict[str, dict[str, Any]] = {}
+load_dotenv()
 
+logger = logging.getLogger(__name__)
 
-# def get_cached_videos(topic_id: str) -> list[dict[str, Any]] | None:
-#     entry = cache.get(topic_id)
-#     if not entry:
-#         return None
+REDIS_URL = os.getenv("REDIS_URL")
 
-#     expires_at: datetime = entry.get("expires_at")
-#     if not isinstance(expires_at, datetime):
-#         cache.pop(topic_id, None)
-#         return None
 
-#     now = datetime.now(timezone.utc)
-#     if expires_at <= now:
-#         cache.pop(topic_id, None)
-#         return None
+class CachePolicy(IntEnum):
+    """TTL in seconds per kind of data."""
 
-#     videos = entry.get("videos")
-#     if isinstance(videos, list):
-#         return videos
-#     return None
+    SHORT = 10                  # topics listings
+    NORMAL = 60
+    HOUR = 60 * 60              # active channel whitelist
+    DAY = 24 * 60 * 60          # subjects listings (change once a term)
+    LONG = 7 * 24 * 60 * 60     # scouted videos (7 days)
 
 
-# def set_cached_videos(topic_id: str, videos: list[dict[str, Any]]) -> None:
-#     cache[topic_id] = {
-#         "videos": videos,
-#         "expires_at": datetime.now(timezone.utc) + _CACHE_TTL,
-#     }
+# Stale copies outlive the fresh entry so a failing upstream can still be served
+STALE_TTL_SECONDS = 7 * 24 * 60 * 60
+STALE_PREFIX = "stale:"
 
-import time
+# Single-flight: one regeneration per key at a time
+LOCK_PREFIX = "lock:"
+LOCK_TTL_SECONDS = 10
+LOCK_POLL_INTERVAL_SECONDS = 0.05
+LOCK_POLL_ATTEMPTS = 40
+
+# Spread expiries so keys written together don't all miss together
+TTL_JITTER_FRACTION = 0.1
+
+_redis = None
 
+# key -> future of the in-progress regeneration in this worker
+_inflight: dict = {}
+
+# In-process fallback: key -> {"value": ..., "expires_at": epoch seconds}
 CACHE = {}
-TTL_SECONDS = 7 * 24 * 60 * 60  # 7 days
 
 
-def get_cache(key: str):
+async def init_cache() -> None:
+    """Connect to Redis if configured (call on app startup)."""
+    global _redis
+    if not REDIS_URL:
+        logger.info("REDIS_URL not set; using in-process cache")
+        return
+    if redis is None:
+        logger.warning("REDIS_URL set but redis package missing; using in-process cache")
+        return
+    _redis = redis.from_url(REDIS_URL)
+
+
+async def close_cache() -> None:
+    """Close the Redis connection pool (call on app shutdown)."""
+    global _redis
+    if _redis is not None:
+        await _redis.aclose()
+        _redis = None
+
+
+async def _get(key: str) -> Optional[Any]:
+    if _redis is not None:
+        raw = await _redis.get(key)
+        return orjson.loads(raw) if raw is not None else None
+
     data = CACHE.get(key)
     if not data:
         return None
@@ -54,8 +100,141 @@ def get_cache(key: str):
     return data["value"]
 
 
-def set_cache(key: str, value):
+async def _set(key: str, value, ttl: int) -> None:
+    if _redis is not None:
+        await _redis.set(key, orjson.dumps(value), ex=int(ttl))
+        return
+
     CACHE[key] = {
         "value": value,
-        "expires_at": time.time() + TTL_SECONDS,
+        "expires_at": time.time() + ttl,
     }
+
+
+async def get_cache(key: str):
+    """Return the cached value for key, or None on a miss (or cache error)."""
+    try:
+        return await _get(key)
+    except Exception as e:
+        # A cache outage should degrade to a miss, never fail the request
+        logger.warning(f"Cache get failed for {key}: {str(e)}")
+        return None
+
+
+async def set_cache(key: str, value, ttl: int = CachePolicy.LONG) -> None:
+    """Store value under key for ttl seconds, plus a long-lived stale copy."""
+    try:
+        await _set(key, value, ttl)
+        await _set(STALE_PREFIX + key, value, max(int(ttl), STALE_TTL_SECONDS))
+    except Exception as e:
+        logger.warning(f"Cache set failed for {key}: {str(e)}")
+
+
+async def get_stale(key: str):
+    """Return the last value stored for key even if expired, or None."""
+    return await get_cache(STALE_PREFIX + key)
+
+
+async def delete_cache(key: str) -> None:
+    """Drop key and its stale copy (e.g. after an admin change)."""
+    try:
+        if _redis is not None:
+            await _redis.delete(key, STALE_PREFIX + key)
+            return
+        CACHE.pop(key, None)
+        CACHE.pop(STALE_PREFIX + key, None)
+    except Exception as e:
+        logger.warning(f"Cache delete failed for {key}: {str(e)}")
+
+
+def jittered_ttl(ttl: int) -> int:
+    """ttl +/- up to TTL_JITTER_FRACTION of itself."""
+    jitter = ttl * TTL_JITTER_FRACTION
+    return max(1, int(ttl + random.uniform(-jitter, jitter)))
+
+
+async def _acquire_lock(key: str) -> bool:
+    if _redis is None:
+        # In-process cache: the _inflight map already coalesces this worker
+        return True
+    try:
+        return bool(await _redis.set(LOCK_PREFIX + key, b"1", nx=True, ex=LOCK_TTL_SECONDS))
+    except Exception as e:
+        logger.warning(f"Cache lock failed for {key}: {str(e)}")
+        return True
+
+
+async def _release_lock(key: str) -> None:
+    if _redis is None:
+        return
+    try:
+        await _redis.delete(LOCK_PREFIX + key)
+    except Exception as e:
+        logger.warning(f"Cache unlock failed for {key}: {str(e)}")
+
+
+async def _regenerate(key: str, compute: Callable[[], Awaitable[Any]], ttl: int) -> Tuple[Any, bool]:
+    if not await _acquire_lock(key):
+        # Another worker is regenerating: wait for its result
+        for _ in range(LOCK_POLL_ATTEMPTS):
+            await asyncio.sleep(LOCK_POLL_INTERVAL_SECONDS)
+            value = await get_cache(key)
+            if value is not None:
+                return value, True
+        # Holder is slow or died; its lock expires on its own, compute ourselves
+        # and store the result so later waiters stop recomputing too
+        logger.warning(f"Timed out waiting for cache fill of {key}")
+        value = await compute()
+        await set_cache(key, value, jittered_ttl(ttl))
+        return value, False
+
+    try:
+        value = await compute()
+        await set_cache(key, value, jittered_ttl(ttl))
+        return value, False
+    finally:
+        await _release_lock(key)
+
+
+async def single_flight(
+    key: str,
+    compute: Callable[[], Awaitable[Any]],
+    ttl: int = CachePolicy.LONG,
+) -> Tuple[Any, bool]:
+    """
+    Cache-aside read where only one caller regenerates a missing key.
+
+    Concurrent misses in this worker await the same in-flight computation;
+    across workers a Redis SET NX lock lets one regenerate while the others
+    poll for the value.
+
+    Args:
+        key: Cache key.
+        compute: Coroutine function producing the value on a miss.
+        ttl: Base TTL in seconds (jittered on write).
+
+    Returns:
+        (value, from_cache) where from_cache is False only for the caller
+        whose compute() produced the value.
+    """
+    value = await get_cache(key)
+    if value is not None:
+        return value, True
+
+    inflight = _inflight.get(key)
+    if inflight is not None:
+        return await asyncio.shield(inflight), True
+
+    future = asyncio.get_running_loop().create_future()
+    # Mark the exception retrieved even if no other caller was waiting
+    future.add_done_callback(lambda f: f.cancelled() or f.exception())
+    _inflight[key] = future
+    try:
+        value, from_cache = await _regenerate(key, compute, ttl)
+        future.set_result(value)
+        return value, from_cache
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        _inflight.pop(key, None)
@@ -0,0 +1,78 @@
+"""
+HTTP caching helpers: strong ETags, If-None-Match handling and Cache-Control.
+
+GET endpoints return through cached_response() so clients and CDNs can
+revalidate with a bodyless 304 instead of re-downloading unchanged data.
+"""
+import hashlib
+from typing import Any, Optional
+
+import orjson
+from fastapi import Request, Response
+
+# Same options as ORJSONResponse, so the hashed bytes are the bytes sent
+_ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+# Cache-Control per endpoint
+SUBJECTS_CACHE_CONTROL = "public, max-age=3600"
+TOPICS_CACHE_CONTROL = "public, max-age=600"
+VIDEOS_CACHE_CONTROL = "private, max-age=60"
+NO_STORE = "no-store"
+
+
+def encode(content: Any) -> bytes:
+    return orjson.dumps(content, option=_ORJSON_OPTIONS)
+
+
+def compute_etag(body: bytes) -> str:
+    """Strong ETag over the serialized body."""
+    return f'"{hashlib.blake2b(body, digest_size=8).hexdigest()}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison (RFC 9110 §13.1.2): W/ prefixes are ignored
+    return any(
+        tag.strip().removeprefix("W/") == etag
+        for tag in if_none_match.split(",")
+    )
+
+
+def cached_response(
+    request: Request,
+    content: Any,
+    cache_control: str,
+    etag: Optional[str] = None,
+) -> Response:
+    """
+    Build a JSON response with ETag and Cache-Control, or a 304 on a match.
+
+    Args:
+        request: Incoming request (for If-None-Match).
+        content: JSON-serializable payload.
+        cache_control: Cache-Control header value.
+        etag: Precomputed ETag for content; when given, a matching request
+            is answered without serializing anything.
+
+    Returns:
+        304 Response when the client's copy is current, else a JSON Response.
+    """
+    body = None
+    if etag is None:
+        body = encode(content)
+        etag = compute_etag(body)
+
+    headers = {
+        "ETag": etag,
+        "Cache-Control": cache_control,
+        "Vary": "Accept-Encoding",
+    }
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    if body is None:
+        body = encode(content)
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,57 @@
+import random
+from collections import Counter
+
+import pytest
+
+from app.prompts import answer_generator
+from app.prompts.answer_generator import _score_paragraphs, _transcript_index
+
+
+@pytest.fixture(params=["str.find", "ahocorasick"])
+def backend(request, monkeypatch):
+    """Run each test with and without pyahocorasick."""
+    if request.param == "ahocorasick":
+        pytest.importorskip("ahocorasick")
+    else:
+        monkeypatch.setattr(answer_generator, "ahocorasick", None)
+    return request.param
+
+
+def _baseline_scores(transcript, keywords):
+    # Plain substring count per paragraph over the keyword list (repeats
+    # included), as the original implementation did
+    paragraphs = transcript.lower().split("\n\n")
+    return [sum(1 for keyword in keywords if keyword in para) for para in paragraphs]
+
+
+def _scores(transcript, keywords):
+    text, starts, _ = _transcript_index(transcript)
+    return _score_paragraphs(text, starts, Counter(keywords))
+
+
+def test_keyword_inside_longer_keyword_counts(backend):
+    transcript = "Processes share memory.\n\nEach process has a PID.\n\nNothing here."
+    keywords = ["process", "processes"]
+
+    assert _scores(transcript, keywords) == [2, 1, 0]
+
+
+def test_matches_substring_baseline(backend):
+    rng = random.Random(0)
+    vocab = ["proc", "process", "processes", "deadlock", "lock", "locks", "page", "paging"]
+    for _ in range(500):
+        paragraphs = [
+            " ".join(rng.choices(vocab + ["the", "and", "x"], k=rng.randint(0, 8)))
+            for _ in range(rng.randint(1, 5))
+        ]
+        transcript = "\n\n".join(paragraphs)
+        keywords = rng.choices(vocab, k=rng.randint(1, 4))
+
+        assert _scores(transcript, keywords) == _baseline_scores(transcript, keywords)
+
+
+def test_repeated_keyword_weighs_more(backend):
+    transcript = "Deadlock basics.\n\nPaging basics."
+    keywords = ["deadlock", "deadlock", "paging"]
+
+    assert _scores(transcript, keywords) == [2, 1]
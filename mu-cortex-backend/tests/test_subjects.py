@@ -0,0 +1,34 @@
+import uuid
+
+import pytest
+
+from app.utils.http_cache import compute_etag, encode
+
+pgproto = pytest.importorskip("asyncpg.pgproto.pgproto")
+
+SUBJECT_ID = "7f1c2a9e-4b3d-4e8a-9c61-2f0d5b8e1a47"
+
+
+def test_asyncpg_uuid_is_not_encodable():
+    # Why list_subjects casts id::text: a raw asyncpg row would 500 on encode()
+    row = {"id": pgproto.UUID(uuid.UUID(SUBJECT_ID).bytes), "name": "Maths"}
+    with pytest.raises(TypeError):
+        encode([row])
+
+
+def test_text_cast_row_encodes_like_postgrest():
+    # Shape of a list_subjects row after the id / timestamptz casts
+    row = {
+        "id": SUBJECT_ID,
+        "name": "Maths",
+        "code": "MA101",
+        "scheme_id": "2019",
+        "semester": 1,
+        "branch": "COMP",
+        "syllabus_pdf_url": None,
+        "created_at": "2024-06-01T10:15:30.123456+00:00",
+        "updated_at": "2024-06-01T10:15:30.123456+00:00",
+    }
+    body = encode([row])
+    assert body.startswith(b'[{"id":"7f1c2a9e-')
+    assert compute_etag(body) == compute_etag(encode([dict(row)]))
@@ -17,12 +17,32 @@ GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 if not GEMINI_API_KEY:
     raise ValueError("❌ GEMINI_API_KEY not found. Check root .env file.")
 
+import hashlib
 import json
 import re
+import sqlite3
 import sys
-from typing import List, Dict
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
+from typing import List, Dict, Optional
 import google.generativeai as genai
 
+try:
+    import orjson
+except ImportError:  # optional; falls back to the stdlib json module
+    orjson = None
+
+# orjson.JSONDecodeError subclasses json.JSONDecodeError
+_json_loads = orjson.loads if orjson else json.loads
+
+
+def _json_dumps(obj) -> str:
+    # Same codec as _json_loads (non-ASCII kept as-is either way)
+    if orjson:
+        return orjson.dumps(obj).decode("utf-8")
+    return json.dumps(obj, ensure_ascii=False)
+
 
 def clean_extracted_text(text: str) -> str:
     """
@@ -52,6 +72,50 @@ def infer_marks(text: str) -> int:
     return 10
 
 
+# Concurrent Phase 2 Gemini requests (kept modest for API quotas)
+NORMALIZE_CONCURRENCY = 8
+
+GEMINI_MODEL_NAME = "models/gemini-2.5-flash"
+
+# Phase 2 results keyed by (prompt version, model, subject, raw_text), so
+# questions repeated across papers/years are normalized by Gemini only once.
+# Bump NORMALIZE_PROMPT_VERSION whenever the normalize prompt changes
+NORMALIZE_PROMPT_VERSION = 1
+NORMALIZE_CACHE_PATH = Path("pyq_parsed") / ".cache.sqlite"
+NORMALIZE_CACHE_COMMIT_EVERY = 10
+
+# Phase 1 patterns, compiled once. All three delimiters are found in one
+# left-to-right scan: main question (group 1), OR, sub-part letter (group 2).
+# OR splits within a question body, so the edges of a Q.N match also count
+# as word boundaries for it: "Q.1OR" and "orQ.2" split. The optional OR after
+# group 1 only moves the segment start past it (the body between is empty)
+_RE_WS = re.compile(r'[ \t]+')
+_OR_END = r'(?:(?!\w)|(?=Q\.\s*\d))'
+_RE_DELIMITER = re.compile(
+    rf'(Q\.\s*\d+)(?:OR{_OR_END})?|(?<!\w)OR{_OR_END}|\n\s*([a-f])\)',
+    re.IGNORECASE,
+)
+
+# Fallback path (no Phase 1 blocks): question starts, and lines that are only
+# MU watermark/footer noise (hex paper IDs, page counters, subject codes)
+_RE_MAIN_Q = re.compile(r'Q\.\s*\d+', re.IGNORECASE)
+_RE_WATERMARK = re.compile(
+    r'^[ \t]*(?:[0-9A-F]{16,}|Page\s+\d+\s+of\s+\d+|Paper\s*/\s*Subject\s+Code\s*:.*)[ \t]*$\n?',
+    re.IGNORECASE | re.MULTILINE,
+)
+# ~3K tokens (about 4 characters per token) per fallback Gemini call
+FALLBACK_WINDOW_CHARS = 12000
+
+
+def _question_block(q_number: str, sub_part, raw: str) -> Dict:
+    return {
+        "q_number": q_number,
+        "sub_part": sub_part,
+        "raw_text": raw,
+        "marks": infer_marks(raw)
+    }
+
+
 def extract_question_blocks(text: str) -> List[Dict]:
     """
     Phase 1 (NO LLM):
@@ -69,53 +133,71 @@ def extract_question_blocks(text: str) -> List[Dict]:
         return blocks
 
     # Normalize text
-    text = re.sub(r'\r', '', text)
-    text = re.sub(r'[ \t]+', ' ', text)
-
-    # Split by main questions: Q.1, Q.2, Q.3
-    main_q_pattern = re.compile(r'(Q\.\s*\d+)', re.IGNORECASE)
-    parts = main_q_pattern.split(text)
-
-    for i in range(1, len(parts), 2):
-        q_number = parts[i].strip()
-        body = parts[i + 1] if i + 1 < len(parts) else ""
-
-        # Split OR blocks first
-        or_parts = re.split(r'\bOR\b', body, flags=re.IGNORECASE)
-
-        for or_index, or_part in enumerate(or_parts):
-            # Split sub-questions: a), b), c)
-            sub_parts = re.split(r'\n\s*([a-f])\)', or_part, flags=re.IGNORECASE)
-
-            if len(sub_parts) == 1:
-                # No sub-parts
-                raw = sub_parts[0].strip()
-                if len(raw) < 30:
-                    continue
-
-                blocks.append({
-                    "q_number": q_number,
-                    "sub_part": None,
-                    "raw_text": raw,
-                    "marks": infer_marks(raw)
-                })
-            else:
-                for j in range(1, len(sub_parts), 2):
-                    sub = sub_parts[j].lower() if j < len(sub_parts) else None
-                    raw = sub_parts[j + 1].strip() if j + 1 < len(sub_parts) else ""
-                    if len(raw) < 20:
-                        continue
-
-                    blocks.append({
-                        "q_number": q_number,
-                        "sub_part": sub,
-                        "raw_text": raw,
-                        "marks": infer_marks(raw)
-                    })
+    text = text.replace('\r', '')
+    text = _RE_WS.sub(' ', text)
+
+    # Walk the delimiters once, slicing the text between them. Within a
+    # question, each OR branch is either one block (no sub-parts) or one block
+    # per sub-part a), b), c) (text before the first sub-part is dropped).
+    q_number = None     # current main question; text before Q.1 is ignored
+    sub_part = None     # current sub-part letter in this OR branch
+    start = 0           # start of the current segment
+
+    for match in chain(_RE_DELIMITER.finditer(text), (None,)):
+        end = match.start() if match else len(text)
+        is_sub_part = match is not None and match.group(2) is not None
+
+        if q_number is not None:
+            raw = text[start:end].strip()
+            if sub_part is not None:
+                if len(raw) >= 20:
+                    blocks.append(_question_block(q_number, sub_part, raw))
+            elif not is_sub_part and len(raw) >= 30:
+                # Whole OR branch without sub-parts
+                blocks.append(_question_block(q_number, None, raw))
+
+        if match is None:
+            break
+        if match.group(1) is not None:
+            q_number = match.group(1).strip()
+            sub_part = None
+        elif is_sub_part:
+            sub_part = match.group(2).lower()
+        else:
+            # OR: a new branch of the same question
+            sub_part = None
+        start = match.end()
 
     return blocks
 
 
+def window_paper_text(text: str) -> List[str]:
+    """
+    Prepare paper text for the fallback LLM call.
+
+    Drops watermark lines, skips everything before the first question and
+    splits the rest at question boundaries into windows of at most
+    FALLBACK_WINDOW_CHARS (a single longer question stays whole).
+
+    Returns:
+        List of text windows; the whole cleaned text when no Q.N is found
+    """
+    text = _RE_WATERMARK.sub('', text)
+    starts = [m.start() for m in _RE_MAIN_Q.finditer(text)]
+    if not starts:
+        return [text] if text.strip() else []
+
+    windows = []
+    window_start = cut = starts[0]
+    for q_end in starts[1:] + [len(text)]:
+        if q_end - window_start > FALLBACK_WINDOW_CHARS and cut > window_start:
+            windows.append(text[window_start:cut])
+            window_start = cut
+        cut = q_end
+    windows.append(text[window_start:])
+    return windows
+
+
 def extract_json_object(text: str) -> Dict:
     """
     Extract a JSON object from a potentially noisy/truncated response.
@@ -130,7 +212,7 @@ def extract_json_object(text: str) -> Dict:
         return {}
     candidate = text[first : last + 1]
     try:
-        obj = json.loads(candidate)
+        obj = _json_loads(candidate)
         return obj if isinstance(obj, dict) else {}
     except Exception:
         return {}
@@ -171,7 +253,7 @@ def extract_json_array(text: str) -> List[Dict]:
         logger.info("⚠️ JSON response appears truncated - attempting recovery")
     
     try:
-        questions = json.loads(repaired_json)
+        questions = _json_loads(repaired_json)
         if isinstance(questions, list):
             logger.info(f"Successfully recovered {len(questions)} questions from response")
             return questions
@@ -192,13 +274,22 @@ class QuestionParser:
     def __init__(self):
         genai.configure(api_key=GEMINI_API_KEY)
         self.model = genai.GenerativeModel(
-            model_name="models/gemini-2.5-flash",
+            model_name=GEMINI_MODEL_NAME,
             generation_config={
                 "temperature": 0.1,
                 "max_output_tokens": 4096
             }
         )
 
+        NORMALIZE_CACHE_PATH.parent.mkdir(exist_ok=True)
+        # Shared by the Phase 2 worker threads; every access holds _cache_lock
+        self._cache = sqlite3.connect(NORMALIZE_CACHE_PATH, check_same_thread=False)
+        self._cache.execute(
+            "CREATE TABLE IF NOT EXISTS norm_cache (h TEXT PRIMARY KEY, json TEXT)"
+        )
+        self._cache_lock = threading.Lock()
+        self._cache_pending = 0
+
     def parse_pyq_text(
         self,
         text: str,
@@ -214,15 +305,60 @@ class QuestionParser:
         # Phase 1: deterministic structure extraction (NO LLM)
         blocks = extract_question_blocks(text)
         if not blocks:
-            logger.warning("⚠️ No question blocks found via regex; falling back to single LLM call")
-            # Keep legacy behavior as a fallback (still uses truncation-safe array extraction)
-            prompt = f"""
+            logger.warning("⚠️ No question blocks found via regex; falling back to LLM extraction")
+            # Legacy single-call behavior, but only over the question span
+            # (watermarks dropped) and split into windows for long papers
+            windows = window_paper_text(text)
+            questions: List[Dict] = []
+            for part, window in enumerate(windows, 1):
+                questions.extend(
+                    self._extract_questions_llm(window, subject_name, exam_info, part, len(windows))
+                )
+            return questions
+
+        # Phase 2: LLM normalization (ONE sub-question per request). Blocks are
+        # independent, so requests run concurrently; map keeps paper order
+        appeared_in = exam_info if exam_info else ""
+
+        with ThreadPoolExecutor(max_workers=NORMALIZE_CONCURRENCY) as executor:
+            normalized = executor.map(
+                lambda b: self._normalize_block(b, subject_name, appeared_in),
+                blocks,
+            )
+            results: List[Dict] = [r for r in normalized if r is not None]
+        self._commit_norm_cache()
+
+        logger.info(f"Extracted {len(results)} questions (two-phase parsing)")
+        return results
+
+    def _extract_questions_llm(
+        self,
+        text: str,
+        subject_name: str,
+        exam_info: str,
+        part: int = 1,
+        parts: int = 1
+    ) -> List[Dict]:
+        """
+        Fallback: extract every question in one window of paper text with a
+        single Gemini call (uses truncation-safe array extraction).
+        """
+        part_note = ""
+        part_log = ""
+        if parts > 1:
+            part_note = (
+                f"\nPAPER PART: {part} of {parts} "
+                "(extract only the questions present in this part)"
+            )
+            part_log = f" (part {part}/{parts})"
+
+        prompt = f"""
 You are an expert at parsing **Mumbai University (MU) examination question papers**.
 
 Your task is to extract **ALL questions** from the paper text below.
 
 SUBJECT: {subject_name}  
-EXAM INFO: {exam_info if exam_info else "Not specified"}
+EXAM INFO: {exam_info if exam_info else "Not specified"}{part_note}
 
 IMPORTANT STRUCTURE RULES (CRITICAL):
 1. MU papers ALWAYS contain Question numbers like:
@@ -274,38 +410,72 @@ EXTRACTED TEXT:
 
 Now extract ALL questions from this paper.
 """
-            try:
-                logger.info("Calling Gemini API for question extraction")
-                response = self.model.generate_content(prompt)
-                response_text = response.text.strip()
-                if not response_text:
-                    logger.error("❌ Empty response from Gemini API")
-                    return []
-                if response_text.startswith("```json"):
-                    response_text = response_text[7:]
-                elif response_text.startswith("```"):
-                    response_text = response_text[3:]
-                if response_text.endswith("```"):
-                    response_text = response_text[:-3]
-                response_text = response_text.strip()
-
-                questions = extract_json_array(response_text)
-                logger.info(f"Extracted {len(questions)} questions")
-                return questions
-            except Exception as e:
-                logger.error(f"Failed to parse questions: {e}")
+        try:
+            logger.info("Calling Gemini API for question extraction")
+            response = self.model.generate_content(prompt)
+            response_text = response.text.strip()
+            if not response_text:
+                logger.error("❌ Empty response from Gemini API")
                 return []
+            if response_text.startswith("```json"):
+                response_text = response_text[7:]
+            elif response_text.startswith("```"):
+                response_text = response_text[3:]
+            if response_text.endswith("```"):
+                response_text = response_text[:-3]
+            response_text = response_text.strip()
+
+            questions = extract_json_array(response_text)
+            logger.info(f"Extracted {len(questions)} questions{part_log}")
+            return questions
+        except Exception as e:
+            logger.error(f"Failed to parse questions: {e}")
+            return []
 
-        # Phase 2: LLM normalization (ONE sub-question at a time)
-        results: List[Dict] = []
-        appeared_in = exam_info if exam_info else ""
-
-        for b in blocks:
-            raw_text = (b.get("raw_text") or "").strip()
-            if not raw_text:
-                continue
+    @staticmethod
+    def _norm_cache_key(subject_name: str, raw_text: str) -> str:
+        key = f"{NORMALIZE_PROMPT_VERSION}\n{GEMINI_MODEL_NAME}\n{subject_name}\n{raw_text}"
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def _get_cached_norm(self, key: str) -> Optional[Dict]:
+        with self._cache_lock:
+            row = self._cache.execute(
+                "SELECT json FROM norm_cache WHERE h = ?", (key,)
+            ).fetchone()
+        return _json_loads(row[0]) if row else None
+
+    def _put_cached_norm(self, key: str, norm: Dict):
+        with self._cache_lock:
+            self._cache.execute(
+                "INSERT OR REPLACE INTO norm_cache (h, json) VALUES (?, ?)",
+                (key, _json_dumps(norm)),
+            )
+            self._cache_pending += 1
+            if self._cache_pending >= NORMALIZE_CACHE_COMMIT_EVERY:
+                self._cache.commit()
+                self._cache_pending = 0
+
+    def _commit_norm_cache(self):
+        with self._cache_lock:
+            if self._cache_pending:
+                self._cache.commit()
+                self._cache_pending = 0
+
+    def _normalize_block(
+        self,
+        b: Dict,
+        subject_name: str,
+        appeared_in: str
+    ) -> Optional[Dict]:
+        """
+        Normalize one Phase 1 block with Gemini (falls back to the raw text).
+        Returns None for blocks without text.
+        """
+        raw_text = (b.get("raw_text") or "").strip()
+        if not raw_text:
+            return None
 
-            normalize_prompt = f"""
+        normalize_prompt = f"""
 You normalize a single Mumbai University exam sub-question.
 
 Constraints:
@@ -338,7 +508,10 @@ RAW SUB-QUESTION TEXT:
 {raw_text}
 """
 
-            try:
+        cache_key = self._norm_cache_key(subject_name, raw_text)
+        try:
+            norm = self._get_cached_norm(cache_key)
+            if norm is None:
                 response = self.model.generate_content(normalize_prompt)
                 response_text = (response.text or "").strip()
                 if not response_text:
@@ -356,39 +529,40 @@ RAW SUB-QUESTION TEXT:
                 norm = extract_json_object(response_text)
                 if not norm:
                     raise ValueError("Could not parse JSON object from Gemini output")
-
-                question_text = norm.get("question_text") or raw_text
-                topic_guess = norm.get("topic_guess") or ""
-                module_number = norm.get("module_number", None)
-                confidence = norm.get("confidence", 0.6)
-
-            except Exception as e:
-                logger.warning(f"⚠️ Gemini normalization failed for {b.get('q_number')}{b.get('sub_part') or ''}: {e}")
-                question_text = raw_text
-                topic_guess = ""
-                module_number = None
-                confidence = 0.6
-
-            results.append(
-                {
-                    "q_number": b.get("q_number"),
-                    "sub_part": b.get("sub_part"),
-                    "question_text": question_text,
-                    "marks": b.get("marks"),
-                    "topic_guess": topic_guess,
-                    "module_number": module_number,
-                    "confidence": confidence,
-                    "appeared_in": appeared_in,
-                }
-            )
-
-        logger.info(f"Extracted {len(results)} questions (two-phase parsing)")
-        return results
+                self._put_cached_norm(cache_key, norm)
+
+            question_text = norm.get("question_text") or raw_text
+            topic_guess = norm.get("topic_guess") or ""
+            module_number = norm.get("module_number", None)
+            confidence = norm.get("confidence", 0.6)
+
+        except Exception as e:
+            logger.warning(f"⚠️ Gemini normalization failed for {b.get('q_number')}{b.get('sub_part') or ''}: {e}")
+            question_text = raw_text
+            topic_guess = ""
+            module_number = None
+            confidence = 0.6
+
+        return {
+            "q_number": b.get("q_number"),
+            "sub_part": b.get("sub_part"),
+            "question_text": question_text,
+            "marks": b.get("marks"),
+            "topic_guess": topic_guess,
+            "module_number": module_number,
+            "confidence": confidence,
+            "appeared_in": appeared_in,
+        }
 
     def save_parsed_questions(self, questions: List[Dict], output_path: str):
         Path(output_path).parent.mkdir(exist_ok=True)
-        with open(output_path, "w", encoding="utf-8") as f:
-            json.dump(questions, f, indent=2, ensure_ascii=False)
+        if orjson:
+            # UTF-8 bytes, same layout as json.dump(indent=2, ensure_ascii=False)
+            with open(output_path, "wb") as f:
+                f.write(orjson.dumps(questions, option=orjson.OPT_INDENT_2))
+        else:
+            with open(output_path, "w", encoding="utf-8") as f:
+                json.dump(questions, f, indent=2, ensure_ascii=False)
 
         logger.info(f"Saved parsed questions to {output_path}")
 
@@ -0,0 +1,45 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("dotenv")
+pytest.importorskip("google.generativeai")
+
+# parse_questions is a script module and refuses to import without a key
+os.environ.setdefault("GEMINI_API_KEY", "test")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from parse_questions import extract_question_blocks  # noqa: E402
+
+LONG = "Explain the working of demand paging with a neat diagram"
+
+
+def _blocks(text):
+    return [(b["q_number"], b["sub_part"], b["raw_text"]) for b in extract_question_blocks(text)]
+
+
+def test_or_splits_branches():
+    assert _blocks(f"Q.1 {LONG}\nOR\n{LONG}") == [("Q.1", None, LONG), ("Q.1", None, LONG)]
+
+
+def test_sub_parts_split_per_or_branch():
+    text = f"Q.2\na) {LONG}\nb) {LONG}\nOR\na) {LONG}"
+    assert _blocks(text) == [("Q.2", "a", LONG), ("Q.2", "b", LONG), ("Q.2", "a", LONG)]
+
+
+def test_or_glued_after_question_number():
+    # No \b between "1" and "OR", but OR starts the question body
+    assert _blocks(f"a)Q.1OR\n{LONG}") == [("Q.1", None, LONG)]
+
+
+def test_or_glued_before_question_number():
+    # OR ends Q.1's body, so it is a delimiter, not part of the sub-part text
+    text = f"Q.1\nb) {LONG}\ng)orQ.2 {LONG}"
+    assert _blocks(text) == [("Q.1", "b", f"{LONG}\ng)"), ("Q.2", None, LONG)]
+
+
+def test_or_inside_word_is_text():
+    text = f"Q.3 Compare ORACLE and MySQL, then {LONG}"
+    assert _blocks(text) == [("Q.3", None, text[4:])]
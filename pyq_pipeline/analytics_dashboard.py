@@ -6,14 +6,18 @@ Read-only analytics for Person C validation purposes.
 """
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional, Dict, List
+from typing import Dict, List
 
 import streamlit as st
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
 import plotly.express as px
-import plotly.graph_objects as go
+import plotly.io as pio
 from dotenv import load_dotenv
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 from supabase import create_client, Client
 
 # Load environment variables from project root .env file
@@ -28,7 +32,31 @@ if not SUPABASE_URL or not SUPABASE_SERVICE_KEY:
     st.error("❌ Missing Supabase service role credentials in .env file")
     st.stop()
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
+
+@st.cache_resource
+def get_supabase() -> Client:
+    """One Supabase client (and its pooled HTTP connections) shared by every rerun and session."""
+    return create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
+
+
+supabase: Client = get_supabase()
+
+# Only the columns the dashboard reads (question_predictions rows carry full
+# question text, so unused columns are pure payload)
+SUMMARY_COLUMNS = (
+    "subject_id, scheme_id, name, code,"
+    " total_questions, high_freq_questions, high_freq_percentage"
+)
+PREDICTION_COLUMNS = (
+    "question_text, marks, appearance_count, last_appeared_year,"
+    " prediction_score, study_priority"
+)
+
+# Figures are serialized on every rerun; orjson does it several times faster
+pio.json.config.default_engine = "orjson"
+# The box plot ships every y value to the browser; a fixed-seed sample of
+# this size keeps the quartiles while capping the payload
+BOX_PLOT_MAX_POINTS = 2000
 
 st.set_page_config(page_title="MU-Cortex | Analytics Dashboard", layout="wide")
 
@@ -36,11 +64,15 @@ st.title("📊 Analytics Dashboard")
 st.caption("🔐 Internal validation dashboard - Read-only analytics")
 
 
-@st.cache_data(ttl=300)
-def get_subjects() -> List[Dict]:
-    """Fetch all subjects from the database."""
+@st.cache_data(ttl=600)
+def get_subject_summaries() -> List[Dict]:
+    """
+    Fetch every subject with its headline stats (subject_light_summary view).
+    One request feeds both the subject picker and the metric cards, so
+    switching subjects only has to load that subject's predictions.
+    """
     try:
-        resp = supabase.table("subjects").select("id, name, code, scheme_id").order("name").execute()
+        resp = supabase.table("subject_light_summary").select(SUMMARY_COLUMNS).order("name").execute()
         return resp.data or []
     except Exception as e:
         st.error(f"Error fetching subjects: {e}")
@@ -48,81 +80,84 @@ def get_subjects() -> List[Dict]:
 
 
 @st.cache_data(ttl=60)
-def get_subject_stats(subject_id: str, scheme_id: str) -> Optional[Dict]:
-    """Fetch subject statistics from subject_question_stats view."""
-    try:
-        resp = (
-            supabase.table("subject_question_stats")
-            .select("*")
-            .eq("subject_id", subject_id)
-            .eq("scheme_id", scheme_id)
-            .execute()
-        )
-        return resp.data[0] if resp.data else None
-    except Exception as e:
-        st.error(f"Error fetching subject stats: {e}")
-        return None
-
-
-@st.cache_data(ttl=60)
-def get_predictions(subject_id: str, scheme_id: str) -> List[Dict]:
-    """Fetch question predictions from question_predictions view."""
+def get_predictions(subject_id: str, scheme_id: str) -> pd.DataFrame:
+    """Fetch question predictions from question_predictions view (highest score first)."""
     try:
         resp = (
             supabase.table("question_predictions")
-            .select("*")
+            .select(PREDICTION_COLUMNS)
             .eq("subject_id", subject_id)
             .eq("scheme_id", scheme_id)
             .order("prediction_score", desc=True)
             .execute()
         )
-        return resp.data or []
+        df = pd.DataFrame(resp.data or [])
+        if "study_priority" in df.columns:
+            # Three repeated labels: categorical codes make the tab's
+            # value_counts / box-plot grouping cheap and the frame smaller
+            df["study_priority"] = df["study_priority"].astype("category")
+        return df
     except Exception as e:
         st.error(f"Error fetching predictions: {e}")
-        return []
+        return pd.DataFrame()
 
 
 @st.cache_data(ttl=60)
 def get_marks_distribution(subject_id: str, scheme_id: str) -> pd.DataFrame:
-    """Fetch or calculate marks distribution."""
+    """Fetch question counts per marks value (aggregated in Postgres by get_marks_dist)."""
     try:
-        # Try to fetch from marks_distribution view if it exists
-        resp = (
-            supabase.table("marks_distribution")
-            .select("*")
-            .eq("subject_id", subject_id)
-            .eq("scheme_id", scheme_id)
-            .execute()
-        )
-        
-        if resp.data:
-            return pd.DataFrame(resp.data)
-    except:
+        resp = supabase.rpc(
+            "get_marks_dist",
+            {"p_subject_id": subject_id, "p_scheme_id": scheme_id},
+        ).execute()
+        return pd.DataFrame(resp.data or [], columns=["marks", "question_count"])
+    except Exception:
         pass
     
-    # Fallback: calculate from predictions
+    # Fallback (function not deployed yet): count the cached predictions
     predictions = get_predictions(subject_id, scheme_id)
-    if not predictions:
+    if predictions.empty:
         return pd.DataFrame(columns=["marks", "question_count"])
     
-    df = pd.DataFrame(predictions)
-    marks_dist = df["marks"].value_counts().reset_index()
-    marks_dist.columns = ["marks", "question_count"]
-    marks_dist = marks_dist.sort_values("marks")
-    return marks_dist
+    return (
+        predictions.groupby("marks", sort=True)
+        .size()
+        .rename("question_count")
+        .reset_index()
+    )
+
+
+@st.cache_data(ttl=60)
+def get_predictions_csv(subject_id: str, scheme_id: str) -> bytes:
+    """Encode the predictions export once per subject; reruns reuse the bytes."""
+    export_df = get_predictions(subject_id, scheme_id)[[
+        "question_text",
+        "marks",
+        "appearance_count",
+        "last_appeared_year",
+        "prediction_score",
+        "study_priority"
+    ]]
+    # Arrow's CSV writer emits UTF-8 bytes directly (no intermediate str).
+    # Unlike DataFrame.to_csv it quotes the header and every string field
+    # (even with quoting_style="needed") and writes whole-number floats such
+    # as last_appeared_year without ".0"; spreadsheets parse the same values
+    sink = pa.BufferOutputStream()
+    pa_csv.write_csv(pa.Table.from_pandas(export_df, preserve_index=False), sink)
+    return sink.getvalue().to_pybytes()
 
 
 # Sidebar: Subject selection
 st.sidebar.header("📚 Subject Selection")
 
-subjects = get_subjects()
+subjects = get_subject_summaries()
 if not subjects:
     st.error("No subjects found in database.")
     st.stop()
 
 # Create subject options with name + scheme
 subject_options = {
-    f"{s['name']} ({s['code']}) - Scheme {s['scheme_id']}": (s["id"], s["scheme_id"])
+    f"{s['name']} ({s['code']}) - Scheme {s['scheme_id']}": s
     for s in subjects
 }
 
@@ -136,19 +171,35 @@ selected_label = st.sidebar.selectbox(
     index=0
 )
 
-selected_subject_id, selected_scheme_id = subject_options[selected_label]
+selected_subject = subject_options[selected_label]
+selected_subject_id = selected_subject["subject_id"]
+selected_scheme_id = selected_subject["scheme_id"]
 
-# Fetch data
-with st.spinner("Loading analytics data..."):
-    stats = get_subject_stats(selected_subject_id, selected_scheme_id)
-    predictions = get_predictions(selected_subject_id, selected_scheme_id)
-    marks_dist = get_marks_distribution(selected_subject_id, selected_scheme_id)
+# Subjects without any questions have no stats row (NULL counts in the view)
+stats = (
+    {**selected_subject, "subject_name": selected_subject["name"]}
+    if selected_subject.get("total_questions") is not None
+    else None
+)
 
 if not stats:
     st.warning(f"No statistics found for selected subject.")
     st.stop()
 
-if not predictions:
+# Fetch data: the two loads are independent, so overlap their round trips.
+# Worker threads get this run's script context so st.error etc. still work
+with st.spinner("Loading analytics data..."):
+    with ThreadPoolExecutor(
+        max_workers=2,
+        initializer=add_script_run_ctx,
+        initargs=(None, get_script_run_ctx()),
+    ) as executor:
+        predictions_future = executor.submit(get_predictions, selected_subject_id, selected_scheme_id)
+        marks_future = executor.submit(get_marks_distribution, selected_subject_id, selected_scheme_id)
+        predictions = predictions_future.result()
+        marks_dist = marks_future.result()
+
+if predictions.empty:
     st.warning(f"No predictions found for selected subject.")
     st.stop()
 
@@ -167,8 +218,8 @@ with col3:
     st.metric("High-Frequency %", f"{high_freq_pct:.1f}%")
 
 with col4:
-    if predictions:
-        avg_score = pd.DataFrame(predictions)["prediction_score"].mean()
+    if not predictions.empty:
+        avg_score = predictions["prediction_score"].mean()
         st.metric("Avg Prediction Score", f"{avg_score:.2f}")
     else:
         st.metric("Avg Prediction Score", "N/A")
@@ -180,8 +231,8 @@ tab1, tab2, tab3 = st.tabs(["📊 Frequency Analysis", "🎯 Predictions", "📝
 with tab1:
     st.markdown("### Question Frequency Analysis")
     
-    if predictions:
-        df = pd.DataFrame(predictions)
+    if not predictions.empty:
+        df = predictions
         
         # Histogram of appearance_count
         st.markdown("#### Appearance Count Distribution")
@@ -221,8 +272,8 @@ with tab1:
 with tab2:
     st.markdown("### Prediction Analysis")
     
-    if predictions:
-        df = pd.DataFrame(predictions)
+    if not predictions.empty:
+        df = predictions
         
         # Pie chart: study_priority distribution
         col_chart1, col_chart2 = st.columns(2)
@@ -243,8 +294,13 @@ with tab2:
         with col_chart2:
             st.markdown("#### Prediction Score by Study Priority")
             if "study_priority" in df.columns and not df["study_priority"].isna().all():
+                box_df = (
+                    df.sample(BOX_PLOT_MAX_POINTS, random_state=0)
+                    if len(df) > BOX_PLOT_MAX_POINTS
+                    else df
+                )
                 fig_box = px.box(
-                    df,
+                    box_df,
                     x="study_priority",
                     y="prediction_score",
                     title="Prediction Score Distribution by Priority",
@@ -294,32 +350,25 @@ with tab3:
     st.markdown("### Marks Distribution")
     
     if not marks_dist.empty:
-        # Bar chart: marks vs question_count
+        # Calculate percentages
+        total = marks_dist["question_count"].sum()
+        marks_dist["percentage"] = (marks_dist["question_count"] / total * 100).round(1)
+        
+        # Bar chart: marks vs question_count, labelled "count / pct%" on the
+        # bars themselves (no extra text-only trace)
+        bar_labels = [
+            f"{count}<br>{pct}%"
+            for count, pct in zip(marks_dist["question_count"], marks_dist["percentage"])
+        ]
         fig_bar = px.bar(
             marks_dist,
             x="marks",
             y="question_count",
             title="Question Count by Marks",
             labels={"marks": "Marks", "question_count": "Number of Questions"},
-            text="question_count"
-        )
-        fig_bar.update_traces(texttemplate="%{text}", textposition="outside")
-        
-        # Calculate percentages
-        total = marks_dist["question_count"].sum()
-        marks_dist["percentage"] = (marks_dist["question_count"] / total * 100).round(1)
-        
-        # Add percentage labels
-        fig_bar.add_trace(
-            go.Scatter(
-                x=marks_dist["marks"],
-                y=marks_dist["question_count"] + (marks_dist["question_count"].max() * 0.05),
-                text=marks_dist["percentage"].astype(str) + "%",
-                mode="text",
-                textfont=dict(size=12, color="black"),
-                showlegend=False
-            )
+            text=bar_labels
         )
+        fig_bar.update_traces(textposition="outside")
         
         fig_bar.update_layout(showlegend=False)
         st.plotly_chart(fig_bar, use_container_width=True)
@@ -337,17 +386,9 @@ with tab3:
 st.markdown("---")
 st.markdown("### 📥 Export Data")
 
-if predictions:
+if not predictions.empty:
     # Prepare CSV data
-    export_df = pd.DataFrame(predictions)
-    csv_data = export_df[[
-        "question_text",
-        "marks",
-        "appearance_count",
-        "last_appeared_year",
-        "prediction_score",
-        "study_priority"
-    ]].to_csv(index=False).encode("utf-8")
+    csv_data = get_predictions_csv(selected_subject_id, selected_scheme_id)
     
     subject_name = stats.get("subject_name", "subject")
     filename = f"{subject_name.replace(' ', '_')}_predictions_{selected_scheme_id}.csv"
@@ -12,6 +12,8 @@ import os
 import sys
 import argparse
 import logging
+from collections import Counter
+from functools import lru_cache
 from pathlib import Path
 from datetime import datetime
 from typing import List, Dict, Optional
@@ -35,6 +37,18 @@ SUPABASE_SERVICE_KEY = os.getenv("SUPABASE_SERVICE_KEY")
 if not SUPABASE_URL or not SUPABASE_SERVICE_KEY:
     raise ValueError("❌ SUPABASE_URL and SUPABASE_SERVICE_KEY must be set in root .env file")
 
+# Columns used by the CSV and summary
+PREDICTION_COLUMNS = (
+    "question_text, marks, appearance_count, last_appeared_year,"
+    " prediction_score, study_priority"
+)
+
+
+@lru_cache(maxsize=1)
+def get_supabase() -> Client:
+    """Shared Supabase client, so repeated main() calls in one process reuse its connections."""
+    return create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
+
 
 def get_subject_info(supabase: Client, subject_id: str, scheme_id: str) -> Optional[Dict]:
     """Fetch subject information from the subjects table."""
@@ -60,7 +74,7 @@ def get_predictions(supabase: Client, subject_id: str, scheme_id: str) -> List[D
     try:
         resp = (
             supabase.table("question_predictions")
-            .select("*")
+            .select(PREDICTION_COLUMNS)
             .eq("subject_id", subject_id)
             .eq("scheme_id", scheme_id)
             .order("prediction_score", desc=True)
@@ -104,62 +118,56 @@ def generate_summary(
     timestamp: str
 ):
     """Generate TXT summary file with statistics and top questions."""
-    with open(output_path, "w", encoding="utf-8") as f:
+    # Count by study priority (single C-level tally)
+    counts = Counter((pred.get("study_priority") or "").lower() for pred in predictions)
+    priority_counts = {
+        "must_study": counts["must_study"],
+        "should_study": counts["should_study"],
+        # Count empty/null as optional
+        "optional": counts["optional"] + counts[""],
+    }
+    
+    # Build the whole report, then write it once
+    parts = [
         # Header
-        f.write("=" * 70 + "\n")
-        f.write("STUDY REPORT SUMMARY\n")
-        f.write("=" * 70 + "\n\n")
-        
+        "=" * 70 + "\n",
+        "STUDY REPORT SUMMARY\n",
+        "=" * 70 + "\n\n",
         # Subject info
-        f.write(f"Subject: {subject['name']}\n")
-        f.write(f"Code: {subject['code']}\n")
-        f.write(f"Scheme: {scheme_id}\n")
-        f.write(f"Generated: {timestamp}\n\n")
-        
+        f"Subject: {subject['name']}\n"
+        f"Code: {subject['code']}\n"
+        f"Scheme: {scheme_id}\n"
+        f"Generated: {timestamp}\n\n",
         # Statistics
-        f.write("-" * 70 + "\n")
-        f.write("STATISTICS\n")
-        f.write("-" * 70 + "\n")
-        f.write(f"Total questions: {len(predictions)}\n\n")
-        
-        # Count by study priority
-        priority_counts = {
-            "must_study": 0,
-            "should_study": 0,
-            "optional": 0,
-        }
-        
-        for pred in predictions:
-            priority = pred.get("study_priority", "").lower()
-            if priority in priority_counts:
-                priority_counts[priority] += 1
-            elif not priority:
-                # Count empty/null as optional
-                priority_counts["optional"] += 1
-        
-        f.write("Study Priority Breakdown:\n")
-        f.write(f"  - Must Study: {priority_counts['must_study']}\n")
-        f.write(f"  - Should Study: {priority_counts['should_study']}\n")
-        f.write(f"  - Optional: {priority_counts['optional']}\n\n")
-        
+        "-" * 70 + "\n",
+        "STATISTICS\n",
+        "-" * 70 + "\n",
+        f"Total questions: {len(predictions)}\n\n",
+        "Study Priority Breakdown:\n"
+        f"  - Must Study: {priority_counts['must_study']}\n"
+        f"  - Should Study: {priority_counts['should_study']}\n"
+        f"  - Optional: {priority_counts['optional']}\n\n",
         # Top 15 questions
-        f.write("-" * 70 + "\n")
-        f.write("TOP 15 QUESTIONS BY PREDICTION SCORE\n")
-        f.write("-" * 70 + "\n\n")
-        
-        top_15 = predictions[:15]
-        for idx, pred in enumerate(top_15, 1):
-            f.write(f"{idx}. {pred.get('question_text', '')[:100]}...\n")
-            f.write(f"   Marks: {pred.get('marks')} | ")
-            f.write(f"Appearances: {pred.get('appearance_count', 0)} | ")
-            
-            last_year = pred.get("last_appeared_year")
-            if last_year:
-                f.write(f"Last Year: {last_year} | ")
-            
-            f.write(f"Score: {pred.get('prediction_score', 0):.2f}\n\n")
-        
-        f.write("=" * 70 + "\n")
+        "-" * 70 + "\n",
+        "TOP 15 QUESTIONS BY PREDICTION SCORE\n",
+        "-" * 70 + "\n\n",
+    ]
+    
+    top_15 = predictions[:15]
+    for idx, pred in enumerate(top_15, 1):
+        last_year = pred.get("last_appeared_year")
+        last_year_part = f"Last Year: {last_year} | " if last_year else ""
+        parts.append(
+            f"{idx}. {pred.get('question_text', '')[:100]}...\n"
+            f"   Marks: {pred.get('marks')} | "
+            f"Appearances: {pred.get('appearance_count', 0)} | "
+            f"{last_year_part}"
+            f"Score: {pred.get('prediction_score', 0):.2f}\n\n"
+        )
+    
+    parts.append("=" * 70 + "\n")
+    
+    Path(output_path).write_text("".join(parts), encoding="utf-8")
     
     logger.info(f"✅ Summary generated: {output_path}")
 
@@ -186,8 +194,7 @@ def main():
     logger.info(f"Subject ID: {args.subject_id}")
     logger.info(f"Scheme ID: {args.scheme_id}")
     
-    # Initialize Supabase client
-    supabase: Client = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
+    supabase = get_supabase()
     
     # Fetch subject info
     logger.info("📋 Fetching subject information...")
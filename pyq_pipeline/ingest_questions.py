@@ -12,12 +12,18 @@ import json
 import re
 import hashlib
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import List, Dict, Optional
 from datetime import datetime
 from dotenv import load_dotenv
 from supabase import create_client, Client
 
+try:
+    import orjson
+except ImportError:  # optional; falls back to the stdlib json module
+    orjson = None
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -41,6 +47,11 @@ if not SUBJECT_ID or not SCHEME_ID:
     raise ValueError("❌ SUBJECT_ID and SCHEME_ID must be set in root .env file or script config")
 
 
+# normalize_text patterns, compiled once
+_PUNCT_RE = re.compile(r'[^\w\s]')
+_WS_RE = re.compile(r'\s+')
+
+
 def normalize_text(text: str) -> str:
     """
     Normalize question text for deduplication.
@@ -50,23 +61,23 @@ def normalize_text(text: str) -> str:
     """
     if not text:
         return ""
-    
-    # Convert to lowercase
-    normalized = text.lower()
-    
-    # Remove punctuation (keep alphanumeric and spaces)
-    normalized = re.sub(r'[^\w\s]', '', normalized)
-    
-    # Collapse whitespace
-    normalized = re.sub(r'\s+', ' ', normalized)
-    
-    return normalized.strip()
+    return _WS_RE.sub(' ', _PUNCT_RE.sub('', text.lower())).strip()
 
 
 def hash_text(text: str) -> str:
     """Generate SHA256 hash from normalized text."""
-    normalized = normalize_text(text)
-    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+    return hashlib.sha256(normalize_text(text).encode('utf-8')).hexdigest()
+
+
+def hash_texts(texts: List[str]) -> List[str]:
+    """hash_text for a batch of texts (same order)."""
+    sha256 = hashlib.sha256
+    return [sha256(normalize_text(t).encode('utf-8')).hexdigest() for t in texts]
+
+
+# Exam years in appeared_in (19xx/20xx), and the fallback year for this run
+_YEAR_RE = re.compile(r'\b(?:19|20)\d{2}\b')
+CURRENT_YEAR = datetime.now().year
 
 
 def extract_year(appeared_in: str) -> int:
@@ -80,56 +91,73 @@ def extract_year(appeared_in: str) -> int:
     Returns current year if no year found (year is NOT NULL in schema).
     """
     if not appeared_in:
-        return datetime.now().year
+        return CURRENT_YEAR
     
-    # Look for 4-digit year patterns (19xx or 20xx)
-    year_pattern = r'\b(19|20)\d{2}\b'
-    matches = re.finditer(year_pattern, appeared_in)
-    
-    years = []
-    for match in matches:
-        full_year_str = match.group(0)
-        try:
-            year = int(full_year_str)
-            if 1900 <= year <= 2100:  # Sanity check
-                years.append(year)
-        except ValueError:
-            continue
-    
-    if years:
-        # Return the most recent year found (prefer exam year over scheme year)
-        return max(years)
-    
-    # Fallback to current year if no valid year found
-    return datetime.now().year
+    # Most recent year found (prefer exam year over scheme year)
+    return max(
+        (int(m.group()) for m in _YEAR_RE.finditer(appeared_in)),
+        default=CURRENT_YEAR,
+    )
 
 
 def load_questions_from_json(json_path: Path) -> List[Dict]:
-    """Load questions from a single JSON file."""
+    """Load questions from a single JSON file (raw bytes straight into the decoder)."""
     try:
-        with open(json_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
+        raw = json_path.read_bytes()
+        data = orjson.loads(raw) if orjson else json.loads(raw)
         
         if not isinstance(data, list):
             logger.warning(f"⚠️ {json_path.name} does not contain a JSON array")
             return []
         
         return data
+    except json.JSONDecodeError as e:
+        # orjson.JSONDecodeError subclasses json.JSONDecodeError
+        logger.error(f"❌ Invalid JSON in {json_path.name}: {e}")
+        return []
     except Exception as e:
         logger.error(f"❌ Failed to load {json_path.name}: {e}")
         return []
 
 
+# JSON files read/decoded concurrently before (serial) ingestion
+LOAD_WORKERS = 8
+
+# PostgREST batch sizes: hashes per IN (...) filter (kept well under URL
+# length limits) and rows per bulk INSERT. Appearance inserts return nothing
+# (Prefer: return=minimal), so they can carry more rows per request
+HASH_LOOKUP_BATCH_SIZE = 100
+INSERT_BATCH_SIZE = 500
+APPEARANCE_BATCH_SIZE = 1000
+
+
+def chunked(items: List, size: int):
+    """Yield consecutive slices of at most size items."""
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def normalize_confidence(confidence) -> Optional[float]:
+    """Convert confidence to a float clamped to the NUMERIC(3,2) range [0, 1]."""
+    if confidence is None:
+        return None
+    try:
+        return min(max(float(confidence), 0.0), 1.0)
+    except (ValueError, TypeError):
+        return None
+
+
 def ingest_questions(supabase: Client, questions: List[Dict], stats: Dict):
     """
-    Ingest questions into Supabase.
+    Ingest questions into Supabase in a handful of batched requests.
     
-    For each question:
-    1. Normalize and hash the question text
-    2. Check if question exists (by normalized_hash)
-    3. Insert into questions if new (with topic_id if available)
-    4. Always insert into question_appearances (with subject_id, scheme_id, confidence)
+    1. Normalize and hash every question text
+    2. Look up existing questions by normalized_hash (batched IN filters)
+    3. Bulk insert the new questions (topic_id left NULL) and collect their ids
+    4. Bulk insert one question_appearances row per question
+       (with subject_id, scheme_id, confidence), duplicates included
     """
+    kept = []
     for q in questions:
         question_text = q.get("question_text", "").strip()
         if not question_text:
@@ -137,67 +165,74 @@ def ingest_questions(supabase: Client, questions: List[Dict], stats: Dict):
             continue
         
         stats["total_questions_read"] += 1
+        kept.append((question_text, q))
+    
+    if not kept:
+        return
+    
+    rows = [
+        (normalized_hash, question_text, q)
+        for normalized_hash, (question_text, q) in zip(hash_texts([t for t, _ in kept]), kept)
+    ]
+    
+    # Existing questions: normalized_hash -> id
+    hashes = list(dict.fromkeys(h for h, _, _ in rows))
+    question_ids: Dict[str, str] = {}
+    for batch in chunked(hashes, HASH_LOOKUP_BATCH_SIZE):
+        existing = (
+            supabase.table("questions")
+            .select("id,normalized_hash")
+            .in_("normalized_hash", batch)
+            .execute()
+        )
+        question_ids.update({r["normalized_hash"]: r["id"] for r in existing.data})
+    
+    # New questions, once per hash (repeats within the file are duplicates)
+    new_questions = {}
+    for normalized_hash, question_text, q in rows:
+        if normalized_hash not in question_ids and normalized_hash not in new_questions:
+            new_questions[normalized_hash] = {
+                "question_text": question_text,
+                "marks": q.get("marks"),
+                "normalized_hash": normalized_hash,
+                "topic_id": None  # topic_id is nullable, can be set later if topic mapping exists
+            }
+    
+    for batch in chunked(list(new_questions.values()), INSERT_BATCH_SIZE):
+        try:
+            result = supabase.table("questions").insert(batch).execute()
+            question_ids.update({r["normalized_hash"]: r["id"] for r in result.data})
+            stats["new_questions"] += len(result.data)
+        except Exception as e:
+            logger.error(f"❌ Failed to insert {len(batch)} question(s): {e}")
+    
+    stats["duplicates_skipped"] += len(rows) - len(new_questions)
+    
+    # Always insert appearances (even if question was duplicate)
+    appearances = []
+    for normalized_hash, _, q in rows:
+        question_id = question_ids.get(normalized_hash)
+        if question_id is None:
+            continue  # question insert failed
         
-        # Normalize and hash
-        normalized_hash = hash_text(question_text)
-        
-        # Check if question already exists
-        existing = supabase.table("questions").select("id").eq("normalized_hash", normalized_hash).execute()
-        
-        if existing.data:
-            # Question exists - use existing ID
-            question_id = existing.data[0]["id"]
-            stats["duplicates_skipped"] += 1
-            logger.debug(f"Found existing question: {normalized_hash[:8]}...")
-        else:
-            # New question - insert it
-            try:
-                new_question = {
-                    "question_text": question_text,
-                    "marks": q.get("marks"),
-                    "normalized_hash": normalized_hash,
-                    "topic_id": None  # topic_id is nullable, can be set later if topic mapping exists
-                }
-                
-                result = supabase.table("questions").insert(new_question).execute()
-                question_id = result.data[0]["id"]
-                stats["new_questions"] += 1
-                logger.debug(f"Inserted new question: {normalized_hash[:8]}...")
-            except Exception as e:
-                logger.error(f"❌ Failed to insert question: {e}")
-                continue
-        
-        # Always insert appearance (even if question was duplicate)
         appeared_in = q.get("appeared_in", "")
-        year = extract_year(appeared_in)
-        confidence = q.get("confidence")
-        
-        # Convert confidence to float if present, ensure it's within NUMERIC(3,2) range
-        if confidence is not None:
-            try:
-                confidence = float(confidence)
-                if confidence < 0:
-                    confidence = 0.0
-                elif confidence > 1.0:
-                    confidence = 1.0
-            except (ValueError, TypeError):
-                confidence = None
-        
+        appearances.append({
+            "question_id": question_id,
+            "appeared_in": appeared_in,
+            "year": extract_year(appeared_in),
+            "subject_id": SUBJECT_ID,
+            "scheme_id": SCHEME_ID,  # TEXT, not UUID (e.g. "2019")
+            "confidence": normalize_confidence(q.get("confidence"))
+        })
+    
+    for batch in chunked(appearances, APPEARANCE_BATCH_SIZE):
         try:
-            appearance = {
-                "question_id": question_id,
-                "appeared_in": appeared_in,
-                "year": year,
-                "subject_id": SUBJECT_ID,
-                "scheme_id": SCHEME_ID,  # TEXT, not UUID (e.g. "2019")
-                "confidence": confidence
-            }
-            
-            logger.info(f"Inserting appearance with scheme_id={SCHEME_ID} (TEXT)")
-            supabase.table("question_appearances").insert(appearance).execute()
-            stats["appearances_inserted"] += 1
+            logger.debug("Inserting %d appearance(s)", len(batch))
+            # Nothing is read back, so skip echoing the inserted rows
+            supabase.table("question_appearances").insert(batch, returning="minimal").execute()
+            stats["appearances_inserted"] += len(batch)
         except Exception as e:
-            logger.error(f"❌ Failed to insert appearance: {e}")
+            logger.error(f"❌ Failed to insert {len(batch)} appearance(s): {e}")
 
 
 def main():
@@ -219,6 +254,7 @@ def main():
         sys.exit(0)
     
     logger.info(f"📂 Found {len(json_files)} JSON file(s) to process")
+    logger.info(f"Ingesting with subject_id={SUBJECT_ID}, scheme_id={SCHEME_ID} (TEXT)")
     
     # Statistics tracking
     stats = {
@@ -229,11 +265,15 @@ def main():
         "duplicates_skipped": 0
     }
     
+    # Load and decode every file up front (concurrently); ingestion stays
+    # serial, one file at a time, so idempotency is unchanged
+    with ThreadPoolExecutor(max_workers=LOAD_WORKERS) as executor:
+        loaded = list(executor.map(load_questions_from_json, json_files))
+    
     # Process each JSON file
-    for json_file in json_files:
+    for json_file, questions in zip(json_files, loaded):
         logger.info(f"📄 Processing: {json_file.name}")
         
-        questions = load_questions_from_json(json_file)
         if not questions:
             logger.warning(f"⚠️ No questions found in {json_file.name}")
             continue
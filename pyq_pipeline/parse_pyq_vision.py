@@ -1,11 +1,31 @@
+import asyncio
 import os
 import sys
 import json
 import re
+import hashlib
 import logging
+from datetime import datetime, timezone
 from pathlib import Path
+from typing import Optional
 from dotenv import load_dotenv
 import google.generativeai as genai
+import pypdfium2 as pdfium
+
+try:
+    import orjson
+except ImportError:  # optional; falls back to the stdlib json module
+    orjson = None
+
+# orjson.JSONDecodeError subclasses json.JSONDecodeError
+_json_loads = orjson.loads if orjson else json.loads
+
+
+def _json_dump_bytes(obj) -> bytes:
+    """Indented UTF-8 JSON, via orjson when available."""
+    if orjson:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+    return json.dumps(obj, indent=2, ensure_ascii=False).encode("utf-8")
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -23,6 +43,25 @@ genai.configure(api_key=API_KEY)
 
 MODEL_NAME = "models/gemini-2.5-flash"
 
+# Papers in flight at once for --batch runs
+GEMINI_CONCURRENCY = int(os.getenv("GEMINI_CONCURRENCY", "8"))
+
+# Bump whenever PROMPT_TEMPLATE changes so cached extractions are not reused
+PROMPT_VERSION = "v1"
+
+# text: send the embedded text layer, vision: send the PDF itself,
+# auto: text when the layer looks usable, else vision
+PDF_HANDLING = os.getenv("PDF_HANDLING", "auto").lower()
+if PDF_HANDLING not in ("text", "vision", "auto"):
+    raise ValueError(f"❌ PDF_HANDLING must be text, vision or auto (got {PDF_HANDLING!r})")
+
+# Born-digital papers clear these easily; scans have little or no text layer
+MIN_TEXT_CHARS_PER_PAGE = 200
+MIN_PRINTABLE_RATIO = 0.9
+
+# Content-addressed results of previous Gemini calls (see cache_key)
+CACHE_DIR = ROOT_DIR / "pyq_parsed" / ".cache"
+
 PROMPT_TEMPLATE = """
 You are an expert Mumbai University examiner.
 
@@ -52,7 +91,19 @@ Return ONLY a JSON array like this:
 ]
 """
 
+_model = None
+
+
+def _get_model():
+    """Per-process GenerativeModel, created on first use and reused by every paper."""
+    global _model
+    if _model is None:
+        _model = genai.GenerativeModel(MODEL_NAME)
+    return _model
+
+
 def extract_text_from_gemini_response(response) -> str:
+    """Text of one response (or one streamed chunk); unstripped so chunks concatenate exactly."""
     if not response.candidates:
         return ""
 
@@ -66,97 +117,376 @@ def extract_text_from_gemini_response(response) -> str:
         if hasattr(part, "text") and part.text:
             text_parts.append(part.text)
 
-    return "\n".join(text_parts).strip()
+    return "".join(text_parts)
+
+
+# Only these characters can change JsonObjectStream's state
+_RE_JSON_SPECIAL = re.compile(r'[{}"\\]')
+
+# JsonObjectStream states: outside strings / inside a string / right after a backslash
+_STRUCT, _STRING, _ESCAPE = range(3)
+
+
+class JsonObjectStream:
+    """
+    Incremental extractor for the top-level objects of a JSON array.
+
+    Text is fed as it arrives; each object is parsed as soon as its closing
+    brace is seen. Braces inside strings are ignored. Code fences, the
+    surrounding brackets, commas and a truncated trailing object are skipped.
+    Only the object in progress is buffered.
+    """
+
+    def __init__(self):
+        self._pending = []      # pieces of the unfinished object from earlier chunks
+        self._depth = 0
+        self._state = _STRUCT
+
+    def feed(self, text: str) -> list:
+        """
+        Consume the next chunk of text.
+
+        Returns:
+            Objects completed within this chunk, in order.
+        """
+        objects = []
+        start = 0 if self._depth else None
+        skip_to = 0
+        if self._state == _ESCAPE:
+            # Previous chunk ended on a backslash; text[0] is the escaped char
+            self._state = _STRING
+            skip_to = 1
+
+        # Jump between structural characters instead of visiting every char
+        for m in _RE_JSON_SPECIAL.finditer(text):
+            i = m.start()
+            if i < skip_to:
+                continue
+            ch = m.group()
+            if self._state == _STRING:
+                if ch == "\\":
+                    if i + 1 < len(text):
+                        skip_to = i + 2
+                    else:
+                        self._state = _ESCAPE
+                elif ch == '"':
+                    self._state = _STRUCT
+            elif ch == '"':
+                if self._depth:
+                    self._state = _STRING
+            elif ch == "{":
+                if self._depth == 0:
+                    start = i
+                self._depth += 1
+            elif ch == "}" and self._depth:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._pending.append(text[start:i + 1])
+                    obj_str = "".join(self._pending)
+                    self._pending = []
+                    start = None
+                    try:
+                        objects.append(_json_loads(obj_str))
+                    except json.JSONDecodeError:
+                        logger.warning(f"⚠️ Skipping malformed object: {obj_str[:200]}")
+        if start is not None:
+            self._pending.append(text[start:])
+        return objects
+
+
+def cache_key(pdf_bytes: bytes, subject: str, exam_info: str, mode: str) -> str:
+    """
+    Hash everything that determines the model output.
+
+    Each field is length-prefixed so adjacent fields can't run into each
+    other (e.g. subject "AB" + exam "C" vs subject "A" + exam "BC").
+    """
+    h = hashlib.sha256()
+    for field in (pdf_bytes, subject.encode(), exam_info.encode(),
+                  MODEL_NAME.encode(), PROMPT_VERSION.encode(), mode.encode()):
+        h.update(len(field).to_bytes(8, "big"))
+        h.update(field)
+    return h.hexdigest()
+
+
+def load_cached(key: str):
+    cache_file = CACHE_DIR / f"{key}.json"
+    if not cache_file.exists():
+        return None
+    try:
+        return _json_loads(cache_file.read_bytes())
+    except (OSError, json.JSONDecodeError) as e:
+        logger.warning(f"⚠️ Ignoring unreadable cache entry {cache_file.name}: {e}")
+        return None
+
+
+def store_cached(key: str, questions: list) -> None:
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    meta = {
+        "model": MODEL_NAME,
+        "prompt_version": PROMPT_VERSION,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+    }
+    # Write then rename so an interrupted run never leaves a truncated entry
+    for path, payload in (
+        (CACHE_DIR / f"{key}.meta.json", meta),
+        (CACHE_DIR / f"{key}.json", questions),
+    ):
+        tmp = path.with_suffix(".tmp")
+        tmp.write_bytes(_json_dump_bytes(payload))
+        tmp.replace(path)
+
+
+def upload_pdf(pdf_path: Path, pdf_bytes: bytes):
+    """
+    Upload a PDF through the File API, reusing an earlier upload of the same bytes.
+
+    The file is streamed from disk rather than base64-inlined in the request.
+    Uploaded files expire server-side after a while, so a remembered handle
+    is checked before reuse and re-uploaded if it is gone.
+    """
+    handle_file = CACHE_DIR / f"upload-{hashlib.sha256(pdf_bytes).hexdigest()}.json"
+    if handle_file.exists():
+        try:
+            uploaded = genai.get_file(_json_loads(handle_file.read_bytes())["name"])
+            if uploaded.state.name == "ACTIVE":
+                logger.info(f"♻️ Reusing uploaded PDF {uploaded.name}")
+                return uploaded
+        except Exception as e:
+            logger.info(f"Previous upload unavailable ({e}); uploading again")
+
+    uploaded = genai.upload_file(path=str(pdf_path), mime_type="application/pdf")
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    handle_file.write_bytes(_json_dump_bytes({
+        "name": uploaded.name,
+        "uploaded_at": datetime.now(timezone.utc).isoformat(),
+    }))
+    return uploaded
+
+
+def _extract_text(pdf_bytes: bytes) -> tuple:
+    """
+    Read the embedded text layer.
+
+    Returns:
+        (text, page_count); text is empty when the PDF has no text layer.
+    """
+    pdf = pdfium.PdfDocument(pdf_bytes)
+    try:
+        pages = []
+        for page in pdf:
+            textpage = page.get_textpage()
+            pages.append(textpage.get_text_range())
+            textpage.close()
+            page.close()
+        return "\n\n".join(pages).strip(), len(pages)
+    finally:
+        pdf.close()
+
+
+def _text_layer_usable(text: str, n_pages: int) -> bool:
+    if len(text) <= MIN_TEXT_CHARS_PER_PAGE * n_pages:
+        return False
+    printable = sum(ch.isprintable() or ch.isspace() for ch in text)
+    return printable / max(len(text), 1) > MIN_PRINTABLE_RATIO
+
+
+def _prepare_request(pdf_path: Path, subject: str, exam_info: str):
+    """
+    Pick text or vision handling and build the Gemini request.
+
+    Returns:
+        (cache_key, cached_questions, contents); contents is None on a cache hit.
+    """
+    pdf_bytes = pdf_path.read_bytes()
+
+    text = ""
+    mode = PDF_HANDLING
+    if mode != "vision":
+        text, n_pages = _extract_text(pdf_bytes)
+        if mode == "auto":
+            mode = "text" if _text_layer_usable(text, n_pages) else "vision"
+        elif not text:
+            logger.warning("⚠️ PDF has no text layer - falling back to vision")
+            mode = "vision"
+
+    key = cache_key(pdf_bytes, subject, exam_info, mode)
+    cached = load_cached(key)
+    if cached is not None:
+        logger.info(f"♻️ Using cached Gemini result for {pdf_path.name} ({len(cached)} questions)")
+        return key, cached, None
+
+    prompt = PROMPT_TEMPLATE + f"\nSUBJECT: {subject}\nEXAM: {exam_info}"
+    if mode == "text":
+        logger.info(f"📄 Sending text layer of {pdf_path.name} to Gemini ({len(text)} chars)")
+        contents = [prompt + f"\n\nPDF TEXT:\n{text}"]
+    else:
+        logger.info(f"📄 Sending {pdf_path.name} to Gemini Vision model")
+        contents = [prompt, upload_pdf(pdf_path, pdf_bytes)]
+    return key, None, contents
 
 
-def recover_json_array(raw: str):
-    import json, re
-    # Remove code fences
-    raw = raw.strip()
-    if raw.startswith("```"):
-        raw = re.sub(r"^```json|```$", "", raw, flags=re.MULTILINE).strip()
+class _ResponseCollector:
+    """Feeds streamed response chunks through JsonObjectStream and caches the result."""
 
-    # Try full parse first
-    try:
-        return json.loads(raw)
-    except json.JSONDecodeError:
-        pass
-
-    # Recover partial JSON array
-    start = raw.find("[")
-    if start == -1:
-        return []
-
-    recovered = []
-    buffer = ""
-    depth = 0
-    for ch in raw[start:]:
-        buffer += ch
-        if ch == "{":
-            depth += 1
-        elif ch == "}":
-            depth -= 1
-            if depth == 0:
-                try:
-                    recovered.append(json.loads(buffer.strip().rstrip(",")))
-                except Exception:
-                    pass
-                buffer = ""
-
-    return recovered
+    def __init__(self, key: str):
+        self.key = key
+        self.questions = []
+        self._stream = JsonObjectStream()
+        self._preview = ""
 
+    def feed(self, chunk) -> list:
+        chunk_text = extract_text_from_gemini_response(chunk)
+        if len(self._preview) < 1000:
+            self._preview += chunk_text[:1000 - len(self._preview)]
+        new = self._stream.feed(chunk_text)
+        self.questions.extend(new)
+        return new
 
-def parse_pdf(pdf_path: Path, subject: str, exam_info: str):
-    logger.info("📄 Sending PDF to Gemini Vision model")
+    def finish(self) -> None:
+        if not self._preview.strip():
+            raise RuntimeError("❌ Gemini returned no readable text (possibly safety-blocked).")
 
-    model = genai.GenerativeModel(MODEL_NAME)
+        if self.questions:
+            logger.info(f"✅ Recovered {len(self.questions)} questions from Gemini response")
+            store_cached(self.key, self.questions)
+        else:
+            logger.error("❌ No valid questions recovered from Gemini output")
+            logger.error(f"Raw response preview: {self._preview}")
+            raise RuntimeError("No valid questions recovered from Gemini output")
 
-    pdf_bytes = pdf_path.read_bytes()
 
-    response = model.generate_content(
-        [
-            PROMPT_TEMPLATE + f"\nSUBJECT: {subject}\nEXAM: {exam_info}",
-            {
-                "mime_type": "application/pdf",
-                "data": pdf_bytes
-            }
-        ],
-        generation_config={"temperature": 0.1}
+def parse_pdf(pdf_path: Path, subject: str, exam_info: str):
+    """
+    Extract questions from a paper, yielding each one as soon as it is parsed.
+
+    Cached results are replayed; a fresh result is cached only once the
+    stream has been consumed completely.
+    """
+    key, cached, contents = _prepare_request(pdf_path, subject, exam_info)
+    if cached is not None:
+        yield from cached
+        return
+
+    model = _get_model()
+
+    response_iter = model.generate_content(
+        contents,
+        generation_config={"temperature": 0.1},
+        stream=True,
     )
 
-    raw = extract_text_from_gemini_response(response)
+    collector = _ResponseCollector(key)
+    for chunk in response_iter:
+        yield from collector.feed(chunk)
+    collector.finish()
+
+
+async def parse_pdf_async(
+    pdf_path: Path, subject: str, exam_info: str, sem: asyncio.Semaphore
+) -> list:
+    """
+    Async counterpart of parse_pdf for batch runs.
+
+    Args:
+        pdf_path: Paper to parse.
+        subject: Subject name for the prompt.
+        exam_info: Exam session for the prompt.
+        sem: Bounds how many papers are in flight at once.
+
+    Returns:
+        All questions recovered from the paper.
+    """
+    async with sem:
+        # Text extraction, cache lookup and upload are blocking
+        key, cached, contents = await asyncio.to_thread(
+            _prepare_request, pdf_path, subject, exam_info
+        )
+        if cached is not None:
+            return cached
+
+        model = _get_model()
+        response = await model.generate_content_async(
+            contents,
+            generation_config={"temperature": 0.1},
+            stream=True,
+        )
+
+        collector = _ResponseCollector(key)
+        async for chunk in response:
+            collector.feed(chunk)
+        collector.finish()
+        return collector.questions
+
+
+def save_questions(pdf_path: Path, questions: list) -> Path:
+    out_dir = ROOT_DIR / "pyq_parsed"
+    out_dir.mkdir(exist_ok=True)
 
-    if not raw:
-        raise RuntimeError("❌ Gemini Vision returned no readable text (possibly safety-blocked).")
+    out_file = out_dir / f"{pdf_path.stem}_vision.json"
+    out_file.write_bytes(_json_dump_bytes(questions))
+    return out_file
+
+
+async def main_batch(pdf_dir: Path, subject: str, exam_info: Optional[str]) -> int:
+    """
+    Parse every PDF in a directory with up to GEMINI_CONCURRENCY requests in flight.
+
+    Args:
+        pdf_dir: Directory of papers.
+        subject: Subject name shared by all papers.
+        exam_info: Exam session for all papers; None uses each file's stem.
+
+    Returns:
+        Number of papers that failed.
+    """
+    paths = sorted(pdf_dir.glob("*.pdf"))
+    if not paths:
+        logger.warning(f"⚠️ No PDFs found in {pdf_dir}")
+        return 0
+
+    sem = asyncio.Semaphore(GEMINI_CONCURRENCY)
+    results = await asyncio.gather(
+        *(parse_pdf_async(p, subject, exam_info or p.stem, sem) for p in paths),
+        return_exceptions=True,
+    )
 
-    questions = recover_json_array(raw)
+    failed = 0
+    for pdf_path, result in zip(paths, results):
+        if isinstance(result, BaseException):
+            failed += 1
+            logger.error(f"❌ {pdf_path.name}: {result}")
+            continue
+        out_file = save_questions(pdf_path, result)
+        logger.info(f"💾 {pdf_path.name}: {len(result)} questions → {out_file}")
 
-    if len(questions) > 0:
-        logger.info(f"✅ Recovered {len(questions)} questions from Gemini Vision response")
-        return questions
-    else:
-        logger.error("❌ No valid questions recovered from Gemini Vision output")
-        logger.error(f"Raw response preview: {raw[:1000]}")
-        raise RuntimeError("No valid questions recovered from Gemini Vision output")
+    logger.info(f"✅ Batch done: {len(paths) - failed}/{len(paths)} papers parsed")
+    return failed
 
 
 def main():
+    if len(sys.argv) >= 4 and sys.argv[1] == "--batch":
+        exam_info = sys.argv[4] if len(sys.argv) > 4 else None
+        failed = asyncio.run(main_batch(Path(sys.argv[2]), sys.argv[3], exam_info))
+        sys.exit(1 if failed else 0)
+
     if len(sys.argv) < 4:
         print("Usage:")
         print("python parse_pyq_vision.py <pdf_path> <subject> <exam_info>")
+        print("python parse_pyq_vision.py --batch <pdf_dir> <subject> [exam_info]")
+        print("  (batch: exam_info defaults to each PDF's file name)")
         sys.exit(1)
 
     pdf_path = Path(sys.argv[1])
     subject = sys.argv[2]
     exam_info = sys.argv[3]
 
-    questions = parse_pdf(pdf_path, subject, exam_info)
+    questions = []
+    for question in parse_pdf(pdf_path, subject, exam_info):
+        questions.append(question)
+        logger.debug(f"Question {len(questions)}: {str(question.get('question_text', ''))[:80]}")
 
-    out_dir = ROOT_DIR / "pyq_parsed"
-    out_dir.mkdir(exist_ok=True)
-
-    out_file = out_dir / f"{pdf_path.stem}_vision.json"
-    out_file.write_text(json.dumps(questions, indent=2), encoding="utf-8")
+    out_file = save_questions(pdf_path, questions)
 
     logger.info(f"✅ Extracted {len(questions)} questions")
     logger.info(f"💾 Saved to {out_file}")
@@ -15,7 +15,101 @@ SUPABASE_SERVICE_KEY = os.getenv("SUPABASE_SERVICE_KEY")
 if not SUPABASE_URL or not SUPABASE_SERVICE_KEY:
     raise RuntimeError("Missing Supabase service role credentials")
 
-supabase = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
+
+@st.cache_resource
+def get_supabase():
+    """One Supabase client (and its HTTP connection pool) shared by every rerun and session."""
+    return create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
+
+
+supabase = get_supabase()
+
+# Question ids per bulk UPDATE ... WHERE id IN (...); keeps the PostgREST
+# request URL well under length limits
+APPROVE_BATCH_SIZE = 200
+
+# Appearances fetched per page (filters are applied by Postgres)
+PAGE_SIZE = 500
+APPEARANCE_COLUMNS = (
+    "id, subject_id, appeared_in, year, "
+    "questions!inner(id, question_text, marks, approved)"
+)
+# Rows rendered per screen; each row is a dozen widgets, and Streamlit
+# rebuilds every one of them on each click
+DISPLAY_PAGE_SIZE = 25
+# PostgREST filter on the embedded question: not yet approved
+UNAPPROVED_FILTER = "approved.is.null,approved.eq.false"
+# Read-only stand-in for a missing embedded question (no allocation per row)
+_EMPTY = {}
+# Fetch results are shared by all sessions for this long (seconds) and
+# cleared on every write
+FETCH_TTL = 60
+
+
+@st.cache_data(ttl=FETCH_TTL, show_spinner=False)
+def fetch_appearances(subject_id, unapproved_only, after_id=None):
+    """
+    Fetch one page of appearances (ordered by id) matching the filters.
+    Keyset pagination (id > after_id) so rows approved or deleted in the
+    meantime don't shift later pages.
+    """
+    query = supabase.table("question_appearances").select(APPEARANCE_COLUMNS)
+    if subject_id:
+        query = query.eq("subject_id", subject_id)
+    if unapproved_only:
+        # questions!inner: filtering the embedded row filters the appearance
+        query = query.or_(UNAPPROVED_FILTER, reference_table="questions")
+    if after_id:
+        query = query.gt("id", after_id)
+    return query.order("id").limit(PAGE_SIZE).execute().data or []
+
+
+@st.cache_data(ttl=FETCH_TTL, show_spinner=False)
+def fetch_counts():
+    """Total and pending-review appearance counts, counted by Postgres (no rows returned)."""
+    total = (
+        supabase.table("question_appearances")
+        .select("id", count="exact", head=True)
+        .execute()
+    )
+    unapproved = (
+        supabase.table("question_appearances")
+        .select("id, questions!inner(approved)", count="exact", head=True)
+        .or_(UNAPPROVED_FILTER, reference_table="questions")
+        .execute()
+    )
+    return total.count or 0, unapproved.count or 0
+
+
+def clear_fetch_cache():
+    """Drop the shared fetch results after a write so no session sees stale rows."""
+    fetch_appearances.clear()
+    fetch_counts.clear()
+
+
+def reset_questions():
+    st.session_state.questions = []
+    # question id -> the question dict shared by all its loaded appearances
+    st.session_state.questions_by_id = {}
+    # question id -> number of loaded appearances
+    st.session_state.appearance_counts = {}
+
+
+def store_page(rows):
+    """Append a fetched page to session state and remember where it ended."""
+    by_id = st.session_state.questions_by_id
+    counts = st.session_state.appearance_counts
+    for row in rows:
+        question = row.get("questions")
+        if question and question.get("id"):
+            # Every appearance shares one dict, so one flag flip updates them all
+            row["questions"] = by_id.setdefault(question["id"], question)
+            counts[question["id"]] = counts.get(question["id"], 0) + 1
+    st.session_state.questions.extend(rows)
+    st.session_state.has_more = len(rows) == PAGE_SIZE
+    if rows:
+        st.session_state.last_id = rows[-1]["id"]
+
 
 st.set_page_config(page_title="MU-Cortex | PYQ Review", layout="wide")
 
@@ -24,11 +118,11 @@ st.caption("🔐 Review app using Supabase SERVICE ROLE")
 
 # Initialize session state for questions (single source of truth)
 # This allows us to:
-# 1. Fetch questions only once on first load
+# 1. Fetch questions only when the filters change
 # 2. Update counts dynamically without re-fetching
 # 3. Make reruns fast (no database calls on rerun)
 if "questions" not in st.session_state:
-    st.session_state.questions = []
+    reset_questions()
     st.session_state.questions_loaded = False
 
 # Filters
@@ -44,58 +138,57 @@ with col_filter2:
 # Normalize subject_id (trim whitespace, treat empty as None)
 subject_id = subject_id.strip() if subject_id and subject_id.strip() else None
 
-# Fetch questions from database ONLY on first load
+# Filters are applied in Postgres, so a filter change means a fresh fetch
+filters = (subject_id, show_unapproved_only)
+if st.session_state.get("filters") != filters:
+    st.session_state.questions_loaded = False
+
+# Fetch the first page and the counts only when (re)loading
 # Session state caching ensures subsequent reruns are instant (no re-fetch)
 if not st.session_state.questions_loaded:
     try:
         with st.spinner("Loading questions..."):
-            # Base query: question_appearances with join to questions
-            query = (
-                supabase
-                .table("question_appearances")
-                .select(
-                    "id, subject_id, appeared_in, year, "
-                    "questions(id, question_text, marks, approved)"
-                )
-            )
-            
-            # Execute query (fetch all, we'll filter in memory)
-            response = query.execute()
-            all_rows = response.data or []
-            
-            # Store in session state
-            st.session_state.questions = all_rows
+            reset_questions()
+            store_page(fetch_appearances(subject_id, show_unapproved_only))
+            st.session_state.total_count, st.session_state.unapproved_count = fetch_counts()
+            st.session_state.filters = filters
             st.session_state.questions_loaded = True
+            st.session_state.page = 0
             
     except Exception as e:
         st.error(f"Error fetching questions: {e}")
         st.stop()
 
-# Filter questions from session state based on current filters
-filtered_rows = st.session_state.questions.copy()
-
-# Apply unapproved filter
-if show_unapproved_only:
-    filtered_rows = [
-        row for row in filtered_rows
-        if row.get("questions", {}).get("approved") is False
-        or row.get("questions", {}).get("approved") is None
-    ]
-
-# Apply subject filter
-if subject_id:
-    filtered_rows = [
-        row for row in filtered_rows
-        if row.get("subject_id") == subject_id
-    ]
-
-# Compute counts from session state
-total_count = len(st.session_state.questions)
-unapproved_count = len([
-    row for row in st.session_state.questions
-    if row.get("questions", {}).get("approved") is False
-    or row.get("questions", {}).get("approved") is None
-])
+# Rows already match the filters; only questions approved during this
+# session (optimistic updates) still need hiding. One pass also collects
+# the ids for "Approve All Visible".
+filtered_rows = []
+# Dict as an ordered set: a question with several loaded appearances is
+# approved (and counted) once
+question_ids_to_approve = {}
+for row in st.session_state.questions:
+    question = row.get("questions") or _EMPTY
+    approved = question.get("approved")
+    if show_unapproved_only and approved:
+        continue
+    filtered_rows.append(row)
+    if not approved and question.get("id"):
+        question_ids_to_approve[question["id"]] = None
+question_ids_to_approve = list(question_ids_to_approve)
+
+# Everything loaded so far has been reviewed: move on to the next page
+if not filtered_rows and st.session_state.has_more:
+    try:
+        with st.spinner("Loading questions..."):
+            store_page(fetch_appearances(subject_id, show_unapproved_only, st.session_state.last_id))
+        st.rerun()
+    except Exception as e:
+        st.error(f"Error fetching questions: {e}")
+        st.stop()
+
+# Counts from Postgres, kept current by the optimistic updates below
+total_count = st.session_state.total_count
+unapproved_count = st.session_state.unapproved_count
 
 # Display dynamic counts (updates immediately from session state)
 st.markdown("### 📊 Statistics")
@@ -111,16 +204,6 @@ with col_count3:
 if len(filtered_rows) > 0:
     st.markdown("---")
     
-    # Get unapproved question IDs from visible rows
-    question_ids_to_approve = []
-    for row in filtered_rows:
-        question = row.get("questions")
-        if question and question.get("id"):
-            question_id = question.get("id")
-            # Only approve if not already approved
-            if not question.get("approved"):
-                question_ids_to_approve.append(question_id)
-    
     col_approve_all, _ = st.columns([1, 3])
     with col_approve_all:
         approve_all_disabled = len(question_ids_to_approve) == 0
@@ -134,18 +217,23 @@ if len(filtered_rows) > 0:
             if len(question_ids_to_approve) > 0:
                 try:
                     with st.spinner(f"Approving {len(question_ids_to_approve)} questions..."):
-                        # Batch update: approve all questions
-                        for q_id in question_ids_to_approve:
+                        # Batch update: one request per APPROVE_BATCH_SIZE ids
+                        for i in range(0, len(question_ids_to_approve), APPROVE_BATCH_SIZE):
                             supabase.table("questions") \
                                 .update({"approved": True}) \
-                                .eq("id", q_id) \
+                                .in_("id", question_ids_to_approve[i:i + APPROVE_BATCH_SIZE]) \
                                 .execute()
                         
+                        clear_fetch_cache()
+
                         # Update session state optimistically
-                        for row in st.session_state.questions:
-                            question = row.get("questions", {})
-                            if question.get("id") in question_ids_to_approve:
+                        for question_id in question_ids_to_approve:
+                            question = st.session_state.questions_by_id[question_id]
+                            if not question.get("approved"):
                                 question["approved"] = True
+                                st.session_state.unapproved_count -= (
+                                    st.session_state.appearance_counts[question_id]
+                                )
                         
                         st.success(f"✅ Approved {len(question_ids_to_approve)} questions!")
                         # Minimal rerun - session state cached, so no re-fetch
@@ -157,11 +245,21 @@ if not filtered_rows:
     st.warning("No questions to review.")
     st.stop()
 
+# Approvals and rejections shrink the list, so clamp the current page
+page_count = (len(filtered_rows) + DISPLAY_PAGE_SIZE - 1) // DISPLAY_PAGE_SIZE
+page = min(st.session_state.get("page", 0), page_count - 1)
+st.session_state.page = page
+page_start = page * DISPLAY_PAGE_SIZE
+page_rows = filtered_rows[page_start:page_start + DISPLAY_PAGE_SIZE]
+
 st.markdown("---")
-st.markdown(f"**Reviewing {len(filtered_rows)} question appearance(s)**")
+st.markdown(
+    f"**Reviewing {len(filtered_rows)} question appearance(s)** "
+    f"(showing {page_start + 1}–{page_start + len(page_rows)}, page {page + 1} of {page_count})"
+)
 
 # Display questions with optimistic updates
-for idx, row in enumerate(filtered_rows):
+for row in page_rows:
     question = row.get("questions")
     if not question:
         continue
@@ -178,25 +276,20 @@ for idx, row in enumerate(filtered_rows):
         continue
     
     with st.container(border=True):
-        st.markdown(f"### ❓ {question_text}")
-        
-        col_info1, col_info2 = st.columns(2)
-        
-        with col_info1:
-            st.markdown(f"**Marks:** {marks}M")
-        
-        with col_info2:
-            status = "✅ Approved" if approved else "⏳ Pending Review"
-            st.markdown(f"**Status:** {status}")
-        
-        st.markdown(f"**Question ID:** `{question_id}`")
-        st.markdown(f"**Appearance ID:** `{appearance_id}`")
+        # One markdown element per row instead of one per field
+        status = "✅ Approved" if approved else "⏳ Pending Review"
+        details = [
+            f"**Marks:** {marks}M &nbsp;&nbsp;&nbsp; **Status:** {status}",
+            f"**Question ID:** `{question_id}`",
+            f"**Appearance ID:** `{appearance_id}`",
+        ]
         if subject_id_display:
-            st.markdown(f"**Subject ID:** `{subject_id_display}`")
+            details.append(f"**Subject ID:** `{subject_id_display}`")
         if row.get('appeared_in'):
-            st.markdown(f"**Appeared in:** {row.get('appeared_in')}")
+            details.append(f"**Appeared in:** {row.get('appeared_in')}")
         if row.get('year'):
-            st.markdown(f"**Year:** {row.get('year')}")
+            details.append(f"**Year:** {row.get('year')}")
+        st.markdown(f"### ❓ {question_text}\n\n" + "  \n".join(details))
 
         col1, col2 = st.columns(2)
 
@@ -210,12 +303,14 @@ for idx, row in enumerate(filtered_rows):
                         .eq("id", question_id) \
                         .execute()
                     
-                    # Update session state optimistically
-                    for row_state in st.session_state.questions:
-                        q = row_state.get("questions", {})
-                        if q.get("id") == question_id:
-                            q["approved"] = True
-                            break
+                    clear_fetch_cache()
+
+                    # Update session state optimistically (the dict is shared
+                    # by every appearance of this question)
+                    question["approved"] = True
+                    st.session_state.unapproved_count -= (
+                        st.session_state.appearance_counts[question_id]
+                    )
                     
                     st.success("✅ Question approved!")
                     # Minimal rerun - session state cached, so no re-fetch
@@ -233,11 +328,18 @@ for idx, row in enumerate(filtered_rows):
                         .eq("id", question_id) \
                         .execute()
                     
+                    clear_fetch_cache()
+
                     # Update session state optimistically (remove from list)
                     st.session_state.questions = [
                         r for r in st.session_state.questions
-                        if r.get("questions", {}).get("id") != question_id
+                        if (r.get("questions") or _EMPTY).get("id") != question_id
                     ]
+                    st.session_state.questions_by_id.pop(question_id, None)
+                    removed = st.session_state.appearance_counts.pop(question_id, 0)
+                    st.session_state.total_count -= removed
+                    if not approved:
+                        st.session_state.unapproved_count -= removed
                     
                     st.warning("❌ Question rejected and removed")
                     # Minimal rerun - session state cached, so no re-fetch
@@ -245,9 +347,32 @@ for idx, row in enumerate(filtered_rows):
                 except Exception as e:
                     st.error(f"Error rejecting question: {e}")
 
-# Refresh button to reload from database (optional)
 st.markdown("---")
+col_prev, col_page, col_next = st.columns([1, 2, 1])
+with col_prev:
+    if st.button("⬅️ Prev", disabled=page == 0, use_container_width=True):
+        st.session_state.page = page - 1
+        st.rerun()
+with col_page:
+    st.caption(f"Page {page + 1} of {page_count}")
+with col_next:
+    if st.button("Next ➡️", disabled=page >= page_count - 1, use_container_width=True):
+        st.session_state.page = page + 1
+        st.rerun()
+
+# Next page from the database (only fetched on request, from the last screen)
+on_last_page = page >= page_count - 1
+if on_last_page and st.session_state.has_more and st.button(f"⬇️ Load {PAGE_SIZE} more"):
+    try:
+        with st.spinner("Loading questions..."):
+            store_page(fetch_appearances(subject_id, show_unapproved_only, st.session_state.last_id))
+        st.rerun()
+    except Exception as e:
+        st.error(f"Error fetching questions: {e}")
+
+# Refresh button to reload from database (optional)
 if st.button("🔄 Refresh from Database"):
+    clear_fetch_cache()
     st.session_state.questions_loaded = False
     st.session_state.questions = []
     st.rerun()
@@ -153,6 +153,8 @@ CREATE INDEX IF NOT EXISTS idx_video_resources_topic_id ON public.video_resource
 CREATE INDEX IF NOT EXISTS idx_video_resources_scheme_id ON public.video_resources (scheme_id);
 CREATE INDEX IF NOT EXISTS idx_video_resources_youtube_video_id ON public.video_resources (youtube_video_id);
 CREATE INDEX IF NOT EXISTS idx_video_resources_channel_name ON public.video_resources (channel_name);
+-- Top videos per topic (fetch_topic_bundle): index-only ordering, no sort
+CREATE INDEX IF NOT EXISTS idx_video_resources_topic_engagement ON public.video_resources (topic_id, engagement_score DESC);
 
 -- Trigger for video_resources.updated_at
 CREATE TRIGGER trg_video_resources_set_updated_at
@@ -216,6 +218,8 @@ COMMENT ON TABLE public.channel_whitelist IS
 CREATE INDEX IF NOT EXISTS idx_channel_whitelist_channel_id ON public.channel_whitelist (channel_id);
 CREATE INDEX IF NOT EXISTS idx_channel_whitelist_scheme_id ON public.channel_whitelist (scheme_id);
 CREATE INDEX IF NOT EXISTS idx_channel_whitelist_status_priority ON public.channel_whitelist (status, priority);
+-- Whitelist membership check by channel name (fetch_topic_bundle)
+CREATE INDEX IF NOT EXISTS idx_channel_whitelist_active_channel_name ON public.channel_whitelist (channel_name) WHERE status = 'active';
 
 -- Trigger for channel_whitelist.updated_at
 CREATE TRIGGER trg_channel_whitelist_set_updated_at
@@ -237,3 +241,108 @@ COMMENT ON COLUMN public.predicted_questions.frequency_score IS
 COMMENT ON COLUMN public.predicted_questions.last_appeared IS
   'Human-readable label for the last exam this question appeared in, e.g., "Dec 2023".';
 
+
+
+-- ==================================
+-- Views
+-- ==================================
+
+-- Every subject with its headline stats from subject_question_stats (the
+-- analytics view maintained in Supabase), for the analytics dashboard's
+-- subject picker and metric cards in a single request. Subjects without
+-- questions keep a row with NULL counts.
+CREATE OR REPLACE VIEW public.subject_light_summary AS
+SELECT
+  s.id        AS subject_id,
+  s.scheme_id,
+  s.name,
+  s.code,
+  sqs.total_questions,
+  sqs.high_freq_questions,
+  sqs.high_freq_percentage
+FROM public.subjects s
+LEFT JOIN public.subject_question_stats sqs
+  ON sqs.subject_id = s.id
+ AND sqs.scheme_id = s.scheme_id;
+
+
+-- ==================================
+-- Functions (called via Supabase RPC)
+-- ==================================
+
+-- Survival study plan: greedy pick of must_study questions by prediction_score
+-- until hours_available is used up. Time per question: 10M → 0.75 hr,
+-- 5M → 0.4 hr, 2M → 0.15 hr; other marks values are skipped.
+-- Only the selected rows leave the database.
+CREATE OR REPLACE FUNCTION public.select_survival_plan(
+  p_subject_id      UUID,
+  p_scheme_id       TEXT,
+  p_hours_available NUMERIC
+)
+RETURNS TABLE (
+  question_id        UUID,
+  question_text      TEXT,
+  marks              INTEGER,
+  appearance_count   INTEGER,
+  last_appeared_year INTEGER,
+  prediction_score   DOUBLE PRECISION,
+  study_priority     TEXT,
+  estimated_hours    NUMERIC
+)
+LANGUAGE plpgsql
+STABLE
+AS $$
+#variable_conflict use_column
+DECLARE
+  r             RECORD;
+  v_hours       NUMERIC;
+  v_total_hours NUMERIC := 0;
+BEGIN
+  FOR r IN
+    SELECT qp.*
+    FROM public.question_predictions qp
+    WHERE qp.subject_id = p_subject_id
+      AND qp.scheme_id = p_scheme_id
+      AND qp.study_priority = 'must_study'
+    ORDER BY qp.prediction_score DESC
+  LOOP
+    v_hours := CASE r.marks WHEN 10 THEN 0.75 WHEN 5 THEN 0.4 WHEN 2 THEN 0.15 END;
+    CONTINUE WHEN v_hours IS NULL;
+    EXIT WHEN v_total_hours + v_hours > p_hours_available;
+
+    v_total_hours      := v_total_hours + v_hours;
+    question_id        := r.question_id;
+    question_text      := r.question_text;
+    marks              := r.marks;
+    appearance_count   := r.appearance_count;
+    last_appeared_year := r.last_appeared_year;
+    prediction_score   := r.prediction_score;
+    study_priority     := r.study_priority;
+    estimated_hours    := v_hours;
+    RETURN NEXT;
+  END LOOP;
+END;
+$$;
+
+
+-- Marks distribution of a subject's predicted questions: one row per marks
+-- value, so the dashboard never downloads question rows just to count them.
+CREATE OR REPLACE FUNCTION public.get_marks_dist(
+  p_subject_id UUID,
+  p_scheme_id  TEXT
+)
+RETURNS TABLE (
+  marks          INTEGER,
+  question_count BIGINT
+)
+LANGUAGE sql
+STABLE
+AS $$
+  SELECT qp.marks, count(*)
+  FROM public.question_predictions qp
+  WHERE qp.subject_id = p_subject_id
+    AND qp.scheme_id = p_scheme_id
+    AND qp.marks IS NOT NULL
+  GROUP BY qp.marks
+  ORDER BY qp.marks;
+$$;
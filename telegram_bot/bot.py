@@ -12,6 +12,7 @@ from dotenv import load_dotenv
 import os
 
 from handlers import FileProcessor
+from utils import extract_hashtags
 
 # Load environment variables
 load_dotenv()
@@ -84,8 +85,7 @@ async def cmd_help(message: Message) -> None:
 async def handle_channel_document(message: Message):
     logger.info(f"[CHANNEL] Document received: {message.document.file_name}")
 
-    caption = message.caption or ""
-    hashtags = [word for word in caption.split() if word.startswith('#')]
+    hashtags = extract_hashtags(message.caption)
 
     if not hashtags:
         await bot.send_message(
@@ -109,7 +109,7 @@ async def handle_channel_document(message: Message):
         chat_id=CHANNEL_ID,
         text=(
             f"✅ Received: {message.document.file_name}\n"
-            f"Tags: {', '.join(hashtags) if hashtags else 'No tags'}\n"
+            f"Tags: {', '.join('#' + tag for tag in hashtags) if hashtags else 'No tags'}\n"
             f"Processing..."
         )
     )
@@ -119,8 +119,7 @@ async def handle_channel_document(message: Message):
 async def handle_channel_photo(message: Message):
     photo = message.photo[-1]
 
-    caption = message.caption or ""
-    hashtags = [word for word in caption.split() if word.startswith('#')]
+    hashtags = extract_hashtags(message.caption)
 
     if not hashtags:
         await bot.send_message(
@@ -141,7 +140,7 @@ async def handle_channel_photo(message: Message):
         chat_id=CHANNEL_ID,
         text=(
             "✅ Received image\n"
-            f"Tags: {', '.join(hashtags) if hashtags else 'No tags'}\n"
+            f"Tags: {', '.join('#' + tag for tag in hashtags) if hashtags else 'No tags'}\n"
             "Processing..."
         )
     )
@@ -150,16 +149,15 @@ async def handle_channel_photo(message: Message):
 @dp.channel_post(F.reply_to_message & (F.reply_to_message.document | F.reply_to_message.photo))
 async def handle_channel_reply_with_tags(message: Message):
     """Handle replies to channel posts with documents/photos to add tags."""
-    reply_text = message.text or ""
-    hashtags = [word for word in reply_text.split() if word.startswith('#')]
+    hashtags = extract_hashtags(message.text)
 
     if hashtags:
         logger.info(f"[CHANNEL] Tags received via reply: {hashtags}")
         
         # Extract subject tag and scheme_id from hashtags
         # Expected format: #SubjectName #SchemeID (e.g., #OperatingSystems #2019Scheme)
-        subject_tag = hashtags[0].replace('#', '').lower() if len(hashtags) > 0 else ""
-        scheme_tag = hashtags[1].replace('#', '').lower() if len(hashtags) > 1 else ""
+        subject_tag = hashtags[0] if len(hashtags) > 0 else ""
+        scheme_tag = hashtags[1] if len(hashtags) > 1 else ""
         
         # Look up subject code from tag
         subject_code = SUBJECT_TAG_TO_CODE.get(subject_tag)
@@ -179,7 +177,7 @@ async def handle_channel_reply_with_tags(message: Message):
         else:
             scheme_id = scheme_tag  # Fallback to original if no match
         
-        tags = [tag.replace('#', '') for tag in hashtags]
+        tags = hashtags
         
         # Process document only if replying to a document (not photo)
         if message.reply_to_message and message.reply_to_message.document:
@@ -1,7 +1,9 @@
+import asyncio
 import os
 import logging
 from datetime import datetime
-from typing import List, Optional
+from functools import lru_cache
+from typing import List, Optional, Tuple
 from pathlib import Path
 
 from aiogram import Bot
@@ -19,11 +21,41 @@ load_dotenv(ROOT_DIR / ".env")
 # Load telegram_bot/.env (Telegram credentials)
 load_dotenv()
 
-# Initialize Supabase client
-supabase: Client = create_client(
-    os.getenv("SUPABASE_URL"),
-    os.getenv("SUPABASE_SERVICE_KEY")
-)
+
+@lru_cache(maxsize=1)
+def get_supabase_client() -> Client:
+    """Process-wide Supabase client, created on first use and then reused."""
+    return create_client(
+        os.getenv("SUPABASE_URL"),
+        os.getenv("SUPABASE_SERVICE_KEY")
+    )
+
+
+@lru_cache(maxsize=256)
+def _subject_lookup(code: str, scheme: str) -> Tuple[str, str]:
+    """
+    Resolve a subject code within a scheme, cached per process.
+
+    Bursts of uploads for the same subject hit the database once. Misses
+    raise instead of returning, so they are not cached and a subject added
+    later is found on the next upload.
+
+    Returns:
+        (subject_id, subject_name)
+
+    Raises:
+        LookupError: No subject with this code in this scheme.
+    """
+    subject = (
+        get_supabase_client().table("subjects")
+        .select("id, name")
+        .eq("code", code)
+        .eq("scheme_id", scheme)
+        .execute()
+    )
+    if not subject.data:
+        raise LookupError(f"No subject {code!r} in scheme {scheme!r}")
+    return subject.data[0]["id"], subject.data[0]["name"]
 
 
 class FileProcessor:
@@ -50,25 +82,20 @@ class FileProcessor:
         file_name = document.file_name
         file_size = document.file_size
 
-        # Fetch subject_id from DB
-        subject = (
-            supabase.table("subjects")
-            .select("id, name")
-            .eq("code", subject_code)
-            .eq("scheme_id", str(scheme_id))
-            .execute()
-        )
+        supabase = get_supabase_client()
 
-        if not subject.data:
+        try:
+            # supabase-py is synchronous; keep its round-trips off the event loop
+            subject_id, subject_name = await asyncio.to_thread(
+                _subject_lookup, subject_code, str(scheme_id)
+            )
+        except LookupError:
             await self.bot.send_message(
                 chat_id=message.chat.id,
                 text="❌ Subject not found for this scheme.",
             )
             return None
 
-        subject_id = subject.data[0]["id"]
-        subject_name = subject.data[0]["name"]
-
         channel_username = os.getenv("TELEGRAM_CHANNEL_USERNAME")
         message_link = (
             f"https://t.me/{channel_username.replace('@', '')}"
@@ -92,10 +119,10 @@ class FileProcessor:
             # They remain NULL until manually approved by admin
         }
 
-        result = (
+        result = await asyncio.to_thread(
             supabase.table("community_resources")
             .insert(data)
-            .execute()
+            .execute
         )
 
         logger.info(
@@ -3,6 +3,8 @@
 import re
 from typing import List, Optional
 
+_HASHTAG_RE = re.compile(r'#(\w+)')
+
 
 def extract_hashtags(caption: Optional[str]) -> List[str]:
     """
@@ -12,13 +14,11 @@ def extract_hashtags(caption: Optional[str]) -> List[str]:
         caption: The caption text (can be None or empty)
         
     Returns:
-        List of hashtags (without the # symbol), lowercase
+        List of unique hashtags (without the # symbol), lowercase, in the
+        order they first appear
     """
     if not caption:
         return []
     
-    # Find all hashtags using regex
-    hashtags = re.findall(r'#(\w+)', caption)
-    
-    # Return lowercase, unique hashtags
-    return list(set(tag.lower() for tag in hashtags))
+    # Lowercase and dedupe in one pass (dict keeps first-seen order)
+    return list(dict.fromkeys(tag.lower() for tag in _HASHTAG_RE.findall(caption)))